@@ -1,16 +1,25 @@
-from fastapi import FastAPI, Depends, HTTPException, Form, Query, Security
+from fastapi import FastAPI, Depends, HTTPException, Form, Query, Request, Security
 from fastapi.security import HTTPAuthorizationCredentials
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
 from playwright.async_api import async_playwright
+from contextlib import asynccontextmanager
 from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 from fastapi.responses import FileResponse
 from starlette.middleware.gzip import GZipMiddleware
+from starlette.datastructures import Headers
+from brotli_asgi import BrotliMiddleware
+from starlette.concurrency import run_in_threadpool
 import playwright._impl._errors as playwright_errors
-import base64
+import pybase64
 import os
+import re
 from datetime import datetime
-from bs4 import BeautifulSoup
-import htmlmin
+from selectolax.lexbor import LexborHTMLParser
+import minify_html
+import asyncio
+import gzip
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 
 from definitions import (
     ScreenshotResponse,
@@ -19,18 +28,91 @@ from definitions import (
     ResponseModel,
     ReaderResponse,
     MarkdownResponse,
+    CacheEvictResponse,
+    BatchRequest,
+    BatchResponse,
+    WAIT_UNTIL,
+    RequestEvent,
+    ResponseEvent,
 )
 import html2text
 from readability import Document
-from utils import generate_cache_key, optimize_image, create_thumbnail, smooth_scroll
-import json
-from PIL import Image
-import io
+import trafilatura
+from utils import (
+    ASSETS_DIR,
+    DOWNLOADS_DIR,
+    generate_cache_key,
+    generate_params_key,
+    IMAGE_EXTENSIONS,
+    negotiate_image_format,
+    capture_screenshot,
+    smooth_scroll,
+    store_asset,
+    store_asset_file,
+    prune_assets,
+    b64encode_file,
+    singleflight,
+    parse_resource_types,
+    block_resource_types,
+)
+import orjson
 import uuid
-from config import setup_configurations, url_to_sha256_filename, hide_cookie_banners
+from typing import Literal, Optional
+from config import (
+    setup_configurations,
+    url_to_sha256_filename,
+    install_cookie_banner_hiding,
+    hide_cookie_banners_now,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Starts Playwright and a shared Chromium instance once per process. Firefox and WebKit
+    are launched on first use. Requests only create (cheap) browser contexts.
+    """
+    app.state.playwright = await async_playwright().start()
+    app.state.browsers = {
+        "chromium": await app.state.playwright.chromium.launch(headless=True)
+    }
+    app.state.browser_lock = asyncio.Lock()
+    app.state.context_semaphore = asyncio.Semaphore(MAX_CONCURRENT_CONTEXTS)
+    # Spawned rather than forked: the parent already runs Playwright and loop threads.
+    app.state.process_pool = ProcessPoolExecutor(
+        max_workers=PROCESS_POOL_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+    sweeper = None
+    if CACHE_TTL["assets"] is not None:
+        sweeper = asyncio.create_task(sweep_assets(CACHE_TTL["assets"]))
+    try:
+        yield
+    finally:
+        if sweeper is not None:
+            sweeper.cancel()
+        app.state.process_pool.shutdown(wait=False, cancel_futures=True)
+        for browser in app.state.browsers.values():
+            await browser.close()
+        await app.state.playwright.stop()
+
+
+async def sweep_assets(max_age):
+    """
+    Periodically deletes stored assets older than `max_age` seconds, off the event loop.
+    """
+    while True:
+        for directory in ASSET_SWEEP_DIRS:
+            try:
+                await run_in_threadpool(prune_assets, directory, max_age)
+            except OSError:
+                pass
+        await asyncio.sleep(ASSET_SWEEP_SECONDS)
 
 
 app = FastAPI(
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     title="Playwright-based Webpage Scraper API",
     description="""
     This API allows users to browse webpages, capture screenshots, minimize HTML content, and extract text from HTML.
@@ -53,8 +135,234 @@ app = FastAPI(
     """,
     version="1.0.0",
 )
-app.add_middleware(GZipMiddleware, minimum_size=500)
-cache, CACHE_EXPIRATION_SECONDS, security, API_KEY = setup_configurations()
+
+
+def merge_vary_headers(raw_headers):
+    """
+    Collapses all Vary headers into one without duplicates. The compressors append
+    "Accept-Encoding" even when the response already varies on it.
+    """
+    headers = []
+    vary = {}
+    for name, value in raw_headers:
+        if name.lower() == b"vary":
+            for field in value.split(b","):
+                field = field.strip()
+                if field:
+                    vary.setdefault(field.lower(), field)
+        else:
+            headers.append((name, value))
+    if vary:
+        headers.append((b"vary", b", ".join(vary.values())))
+    return headers
+
+
+class CompressionMiddleware:
+    """
+    Brotli for clients that accept it, gzip for everyone else. Both use moderate levels:
+    the large JSON bodies gain little from maximum compression but cost much more CPU.
+    """
+
+    def __init__(self, app, minimum_size=1000):
+        self.app = app
+        self.brotli = BrotliMiddleware(
+            self._unless_encoded,
+            quality=4,
+            minimum_size=minimum_size,
+            gzip_fallback=False,
+        )
+        self.gzip = GZipMiddleware(
+            self._unless_encoded, minimum_size=minimum_size, compresslevel=5
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        async def send_merging_vary(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = merge_vary_headers(message.get("headers", []))
+            await send(message)
+
+        scope["compression.send"] = send_merging_vary
+        accept_encoding = Headers(scope=scope).get("accept-encoding", "")
+        if "br" in accept_encoding:
+            return await self.brotli(scope, receive, send_merging_vary)
+        await self.gzip(scope, receive, send_merging_vary)
+
+    async def _unless_encoded(self, scope, receive, send):
+        """
+        Runs the app under the compressors, but sends responses that already carry a
+        Content-Encoding (gzip straight from the cache) past them untouched.
+        """
+        raw_send = scope["compression.send"]
+        encoded = False
+
+        async def send_message(message):
+            nonlocal encoded
+            if message["type"] == "http.response.start":
+                encoded = any(
+                    name.lower() == b"content-encoding"
+                    for name, _ in message.get("headers", [])
+                )
+            await (raw_send if encoded else send)(message)
+
+        await self.app(scope, receive, send_message)
+
+
+app.add_middleware(CompressionMiddleware, minimum_size=1000)
+os.makedirs(ASSETS_DIR, exist_ok=True)
+os.makedirs(DOWNLOADS_DIR, exist_ok=True)
+cache, CACHE_TTL, security, API_KEY = setup_configurations()
+_MISS = object()
+SUPPORTED_BROWSERS = ("chromium", "firefox", "webkit")
+
+MAX_CONCURRENT_CONTEXTS = int(os.getenv("MAX_CONCURRENT_CONTEXTS", 8))
+# How long a request may queue for a free context before it is rejected with a 503.
+CONTEXT_WAIT_SECONDS = float(os.getenv("CONTEXT_WAIT_SECONDS", 30))
+
+# /browse only captures response bodies on request, for these resource types, and up
+# to MAX_BODY_BYTES per body.
+BODY_RESOURCE_TYPES = {"document", "xhr", "fetch"}
+MAX_BODY_BYTES = int(os.getenv("MAX_BODY_BYTES", 1024 * 1024))
+BODY_TOO_LARGE = "Response body omitted: exceeds max_body_bytes"
+# Pathological pages can issue thousands of requests; stop recording after this many
+# network events and flag the response as truncated.
+MAX_NETWORK_EVENTS = int(os.getenv("MAX_NETWORK_EVENTS", 500))
+# Upper bound for each deferred per-event lookup (sizes, bodies), so a request that never
+# finishes, e.g. a long poll, cannot hold up the /browse response.
+NETWORK_DETAILS_TIMEOUT = float(os.getenv("NETWORK_DETAILS_TIMEOUT", 5))
+
+# HTML inputs longer than this are processed in a worker process instead of a thread,
+# so large documents run on other cores instead of contending for the GIL.
+PROCESS_POOL_THRESHOLD = int(os.getenv("PROCESS_POOL_THRESHOLD", 1024 * 1024))
+PROCESS_POOL_WORKERS = int(os.getenv("PROCESS_POOL_WORKERS", os.cpu_count() or 1))
+
+# Inputs larger than this (in characters) are minified under a wall-clock budget;
+# if the budget is exceeded the original HTML is returned, while the minification
+# finishes in the background and caches its result for the next request.
+MINIFY_BUDGET_THRESHOLD = int(os.getenv("MINIFY_BUDGET_THRESHOLD", 1_000_000))
+MINIFY_BUDGET_SECONDS = float(os.getenv("MINIFY_BUDGET_SECONDS", 2.0))
+# Budgeted minifications still running, by cache key, so that repeated requests for
+# the same input wait on the running work instead of starting it again.
+_minify_tasks = {}
+
+# How often expired assets are pruned, see CACHE_TTL["assets"].
+ASSET_SWEEP_SECONDS = float(os.getenv("ASSET_SWEEP_SECONDS", 3600))
+ASSET_SWEEP_DIRS = (ASSETS_DIR, DOWNLOADS_DIR)
+
+# Maximum number of requests accepted by a single POST /batch.
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", 20))
+
+# Title and meta description in a single round-trip. Unlike a locator, a missing meta
+# tag does not wait for the element to appear.
+PAGE_METADATA_SCRIPT = """() => ({
+    title: document.title,
+    description: document.querySelector("meta[name='description']")?.content || null,
+})"""
+
+
+# Stored files are named by the SHA-256 hash of their content, plus an extension.
+STORED_FILE_NAME = re.compile(r"[0-9a-f]{64}(\.[^/\\]+)?")
+
+
+def asset_url(filename):
+    return f"/assets/{filename}"
+
+
+def stored_file_path(directory, filename):
+    """
+    Returns the path of a stored asset or download, or raises a 404 for any name this
+    service did not produce.
+    """
+    path = os.path.join(directory, filename)
+    if not STORED_FILE_NAME.fullmatch(filename) or not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Not Found")
+    return path
+
+
+async def run_cpu_bound(func, html):
+    """
+    Runs `func(html)` off the event loop: in the threadpool for typical inputs, or in
+    the process pool once `html` exceeds PROCESS_POOL_THRESHOLD.
+    """
+    if len(html) > PROCESS_POOL_THRESHOLD:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(app.state.process_pool, func, html)
+    return await run_in_threadpool(func, html)
+
+
+def cache_headers(etag, ttl, vary=None):
+    """
+    ETag and Cache-Control headers for a cached result. Results without a TTL are keyed
+    by their input and never change, so clients may keep them for a year. Pass `vary`
+    for results negotiated from request headers, so shared caches key on them too.
+    """
+    max_age = ttl if ttl is not None else 31536000
+    headers = {"ETag": f'"{etag}"', "Cache-Control": f"max-age={max_age}"}
+    if vary:
+        headers["Vary"] = vary
+    return headers
+
+
+def not_modified(request: Request, headers):
+    """
+    Returns a 304 response if a GET or HEAD request's If-None-Match names the ETag in
+    `headers`. Only call it for a result that exists (e.g. a cache hit), since "*" matches
+    any current representation.
+    """
+    if request.method not in ("GET", "HEAD"):
+        return None
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    etags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if "*" in etags or headers["ETag"] in etags:
+        return Response(status_code=304, headers=headers)
+    return None
+
+
+async def compress_json(body):
+    """
+    Gzips serialized JSON for the cache, off the event loop. Cached bodies are stored
+    compressed so hits can be sent without compressing them again.
+    """
+    return await run_in_threadpool(gzip.compress, body, 6)
+
+
+async def cached_json_response(request: Request, stored, ttl, headers=None):
+    """
+    Serves a gzip-compressed JSON body from the cache: as-is to clients that accept
+    gzip, decompressed off the event loop for the rest. Answers a matching
+    If-None-Match with a 304. The body's image format is negotiated from Accept.
+    """
+    headers = {
+        **cache_headers(
+            generate_cache_key(stored), ttl, vary="Accept, Accept-Encoding"
+        ),
+        **(headers or {}),
+    }
+    response = not_modified(request, headers)
+    if response is not None:
+        return response
+
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return json_bytes_response(stored, headers=headers)
+    body = await run_in_threadpool(gzip.decompress, stored)
+    return json_bytes_response(body, headers=headers)
+
+
+def json_bytes_response(body, status_code=200, headers=None):
+    """
+    Returns already-serialized JSON as-is, e.g. straight from the cache.
+    """
+    return Response(
+        content=body,
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
 
 
 def optional_auth(
@@ -78,24 +386,127 @@ def optional_auth(
         )
 
 
+def require_api_key(
+    credentials: HTTPAuthorizationCredentials = Security(security),
+):
+    """
+    Always enforces Bearer token authentication, for administrative routes.
+    If API_KEY is "none", those routes are disabled and answer 404.
+    """
+    if API_KEY == "none":
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not credentials:
+        raise HTTPException(
+            status_code=401, detail="Authorization header missing or invalid"
+        )
+    if credentials.credentials != API_KEY:
+        raise HTTPException(status_code=403, detail="Invalid API key")
+    return credentials
+
+
+async def get_browser(browser_name: str = "chromium"):
+    """
+    Returns the shared browser for `browser_name`, (re)launching it if it is missing or
+    has disconnected.
+    """
+    browser = app.state.browsers.get(browser_name)
+    if browser is not None and browser.is_connected():
+        return browser
+
+    async with app.state.browser_lock:
+        browser = app.state.browsers.get(browser_name)
+        if browser is None or not browser.is_connected():
+            browser_type = getattr(app.state.playwright, browser_name)
+            browser = await browser_type.launch(headless=True)
+            app.state.browsers[browser_name] = browser
+        return browser
+
+
+@asynccontextmanager
+async def browser_context(browser_name: str = "chromium", **context_options):
+    """
+    Opens a new context on the shared browser, bounded by MAX_CONCURRENT_CONTEXTS.
+    Raises a 503 with Retry-After if no context frees up within CONTEXT_WAIT_SECONDS.
+    The context is always closed on exit.
+    """
+    semaphore = app.state.context_semaphore
+    try:
+        await asyncio.wait_for(semaphore.acquire(), timeout=CONTEXT_WAIT_SECONDS)
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=503,
+            detail="All browser contexts are busy, try again later",
+            headers={"Retry-After": str(max(1, int(CONTEXT_WAIT_SECONDS)))},
+        )
+    try:
+        browser = await get_browser(browser_name)
+        context = await browser.new_context(**context_options)
+        try:
+            yield context
+        finally:
+            await context.close()
+    finally:
+        semaphore.release()
+
+
 @app.get("/browse", response_model=ResponseModel)
 async def browse(
+    request: Request,
     url: str,
     method: str = "GET",
     post_data: str = None,
     browser_name: str = "chromium",
     cookiebanner: bool = Query(False, description="Attempt to close cookie banners"),
     scroll: bool = Query(False, description="Attempt to scroll down the page."),
+    record_video: bool = Query(
+        False, description="Record and return a video of the session."
+    ),
+    embed: bool = Query(
+        False, description="Also embed screenshot, thumbnail and video as base64."
+    ),
+    image_format: Optional[Literal["webp", "jpeg"]] = Query(
+        None, description="Screenshot format. Negotiated from Accept if omitted."
+    ),
+    capture_bodies: bool = Query(
+        False, description="Capture document, XHR and fetch response bodies."
+    ),
+    max_body_bytes: int = Query(
+        MAX_BODY_BYTES,
+        gt=0,
+        description="Largest body to capture, at most MAX_BODY_BYTES.",
+    ),
+    screenshot: bool = Query(True, description="Capture a screenshot and thumbnail."),
+    downloads: bool = Query(True, description="Accept and store file downloads."),
+    embed_downloads: bool = Query(
+        False, description="Also embed downloaded files as base64."
+    ),
+    block_resources: str = Query(
+        "",
+        description="Comma-separated resource types to abort, e.g. image,font,media.",
+    ),
+    wait_until: WAIT_UNTIL = Query(
+        "load", description="Load state to wait for before capturing the page."
+    ),
     credentials: HTTPAuthorizationCredentials = Depends(optional_auth),
 ):
     """
-    Browse a webpage and gather various details including network data, logs, performance metrics, screenshots, and a video of the session.
+    Browse a webpage and gather various details including network data, logs, performance metrics, screenshots, and optionally a video of the session.
 
     ### Parameters:
     - **url**: (str) The URL of the webpage to browse.
     - **method**: (str) The HTTP method to use. Defaults to GET.
     - **post_data**: (str) Optional POST data to send if method is POST.
     - **browser_name**: (str) The browser to use (chromium, firefox, webkit). Defaults to "chromium".
+    - **record_video**: (bool) Record a video of the session. Defaults to False.
+    - **embed**: (bool) Also return the screenshot, thumbnail and video inline as base64, for older clients. Defaults to False.
+    - **image_format**: (str) Screenshot format, "webp" or "jpeg". If omitted, WebP is used unless the Accept header lists image types without WebP.
+    - **capture_bodies**: (bool) Capture response bodies of document, XHR and fetch requests, up to `max_body_bytes` each. Defaults to False.
+    - **max_body_bytes**: (int) Largest response body to capture with `capture_bodies`. Capped at (and defaults to) `MAX_BODY_BYTES`.
+    - **screenshot**: (bool) Capture a screenshot and thumbnail. Pass False to skip the capture and its encoding when only network data is needed. Defaults to True.
+    - **downloads**: (bool) Accept and store files the page downloads. With False they are cancelled. Defaults to True.
+    - **embed_downloads**: (bool) Also return downloaded files inline as base64, for older clients. Defaults to False.
+    - **block_resources**: (str) Comma-separated Playwright resource types (e.g. "image,font,media") whose requests are aborted. Defaults to none.
+    - **wait_until**: (str) Load state to wait for: "domcontentloaded", "load" or "networkidle". Defaults to "load".
     - **credentials**: (HTTPAuthorizationCredentials) Optional Bearer token for API authentication.
 
     ### Returns:
@@ -104,52 +515,169 @@ async def browse(
         - **page_title**: (str) The title of the webpage.
         - **meta_description**: (str) The meta description of the webpage, if available.
         - **network_data**: (List[NetworkDataModel]) Detailed timing and headers for each network request.
+        - **network_data_truncated**: (bool) Whether network events were dropped after `MAX_NETWORK_EVENTS`.
         - **logs**: (List[LogModel]) Console logs and JavaScript errors encountered on the webpage.
         - **cookies**: (List[CookieModel]) Cookies set by the webpage.
         - **performance_metrics**: (PerformanceMetricsModel) Performance timing metrics for the page load.
-        - **screenshot**: (str) A base64-encoded screenshot of the webpage.
-        - **thumbnail**: (str) A base64-encoded thumbnail of the webpage.
-        - **downloaded_files**: (List[DownloadedFileModel]) Files downloaded during the browsing session.
-        - **video**: (str) A base64-encoded video of the browsing session.
-
-    ### Example of decoding the video on the client side:
+        - **screenshot_url**: (str) URL of the screenshot of the webpage, or null if `screenshot` is False.
+        - **thumbnail_url**: (str) URL of the thumbnail of the webpage, or null if `screenshot` is False.
+        - **video_url**: (str) URL of the video of the browsing session, or null unless `record_video` is set.
+        - **screenshot**: (str) A base64-encoded screenshot of the webpage, or null unless `embed` is set.
+        - **thumbnail**: (str) A base64-encoded thumbnail of the webpage, or null unless `embed` is set.
+        - **downloaded_files**: (List[DownloadedFileModel]) Files downloaded during the browsing session, with a `file_url` to fetch each one.
+        - **video**: (str) A base64-encoded video of the browsing session, or null unless `record_video` and `embed` are set.
+
+    ### Example of downloading the video on the client side:
     ```python
-    import base64
+    import requests
 
-    base64_video = response_data['video']
-    video_bytes = base64.b64decode(base64_video)
+    video_bytes = requests.get(base_url + response_data['video_url']).content
     with open('session_video.webm', 'wb') as video_file:
         video_file.write(video_bytes)
     ```
     """
-    cache_key = generate_cache_key(f"{url}-{method}-{post_data}-{browser_name}")
-    request_uuid_map = {}
+    if browser_name not in SUPPORTED_BROWSERS:
+        return ORJSONResponse(
+            content={"error": f'Browser "{browser_name}" is not supported'},
+            status_code=400,
+        )
 
-    if cache_key in cache:
-        return JSONResponse(content=json.loads(cache[cache_key]))
+    image_format = image_format or negotiate_image_format(request.headers.get("accept"))
+    blocked_types = parse_resource_types(block_resources)
+    max_body_bytes = min(max_body_bytes, MAX_BODY_BYTES) if capture_bodies else 0
+    cache_key = generate_params_key(
+        url=url,
+        method=method,
+        post_data=post_data,
+        browser_name=browser_name,
+        cookiebanner=cookiebanner,
+        scroll=scroll,
+        record_video=record_video,
+        embed=embed,
+        image_format=image_format,
+        capture_bodies=capture_bodies,
+        max_body_bytes=max_body_bytes,
+        screenshot=screenshot,
+        downloads=downloads,
+        embed_downloads=embed_downloads,
+        blocked_types=sorted(blocked_types),
+        wait_until=wait_until,
+    )
+    fresh_key = f"fresh:{cache_key}"
+    stale_key = f"stale:{cache_key}"
+
+    cached = cache.get(fresh_key, default=_MISS)
+    if cached is not _MISS:
+        return await cached_json_response(request, cached, CACHE_TTL["browse"])
+
+    # Waiters share the result, so it is turned into a response per request: responses
+    # are mutated by the compression middleware, and clients differ in what they accept.
+    result = await singleflight(
+        fresh_key,
+        lambda: _browse_and_cache(
+            fresh_key,
+            stale_key,
+            url,
+            method=method,
+            post_data=post_data,
+            browser_name=browser_name,
+            cookiebanner=cookiebanner,
+            scroll=scroll,
+            record_video=record_video,
+            embed=embed,
+            image_format=image_format,
+            capture_bodies=capture_bodies,
+            max_body_bytes=max_body_bytes,
+            screenshot=screenshot,
+            downloads=downloads,
+            embed_downloads=embed_downloads,
+            blocked_types=blocked_types,
+            wait_until=wait_until,
+        ),
+    )
+    if isinstance(result, dict):
+        return ORJSONResponse(content=result)
+    stored, headers = result
+    return await cached_json_response(request, stored, CACHE_TTL["browse"], headers)
+
+
+async def _browse_and_cache(fresh_key, stale_key, url, **browse_options):
+    """
+    Runs a /browse session and caches the result, falling back to the stale copy.
 
-    async with async_playwright() as p:
-        browser_type = getattr(p, browser_name, None)
-        if browser_type is None:
-            return JSONResponse(
-                content={"error": f'Browser "{browser_name}" is not supported'},
-                status_code=400,
-            )
+    Returns the stored (gzipped) body and extra headers, or the response data itself
+    for results that are not cached.
+    """
+    try:
+        response_data, complete = await _browse_page(url, **browse_options)
+    except playwright_errors.Error as e:
+        stale = _stale_response(stale_key)
+        if stale is not None:
+            return stale
+        raise HTTPException(
+            status_code=502, detail=f"Error browsing the page: {str(e)}"
+        )
+
+    if not complete:
+        # Navigation never finished; prefer the last good result over a partial one.
+        return _stale_response(stale_key) or response_data
+
+    # Serialize and compress once; both cache entries and the response share the bytes
+    stored = await compress_json(orjson.dumps(response_data))
+    cache.set(fresh_key, stored, expire=CACHE_TTL["browse"], tag="browse")
+    cache.set(stale_key, stored, expire=CACHE_TTL["browse_stale"], tag="browse")
+    return stored, None
+
+
+def _stale_response(stale_key):
+    stale = cache.get(stale_key, default=_MISS)
+    if stale is _MISS:
+        return None
+    return stale, {"X-Cache": "STALE"}
+
+
+async def _browse_page(
+    url,
+    method,
+    post_data,
+    browser_name,
+    cookiebanner,
+    scroll,
+    record_video,
+    embed,
+    image_format,
+    capture_bodies,
+    max_body_bytes,
+    screenshot,
+    downloads,
+    embed_downloads,
+    blocked_types,
+    wait_until,
+):
+    """
+    Runs the Playwright session behind /browse.
 
-        download_dir = os.path.join(os.getcwd(), "downloads")
-        os.makedirs(download_dir, exist_ok=True)
+    Returns the response data and whether navigation completed. Playwright errors that
+    are not handled inside the session are propagated to the caller.
+    """
+    request_uuid_map = {}
+    navigation_complete = True
+    network_truncated = False
 
+    context_options = {"accept_downloads": downloads}
+    if record_video:
         # Set up video recording directory
         video_dir = os.path.join(os.getcwd(), "videos")
         os.makedirs(video_dir, exist_ok=True)
-
-        # Launch browser with video recording enabled
-        browser = await browser_type.launch(headless=True)
-        context = await browser.new_context(
-            accept_downloads=True,
-            record_video_dir=video_dir,
-            record_video_size={"width": 640, "height": 360},
-        )
+        context_options["record_video_dir"] = video_dir
+        context_options["record_video_size"] = {"width": 640, "height": 360}
+
+    # Open a context on the shared browser, recording video only when requested
+    async with browser_context(browser_name, **context_options) as context:
+        await block_resource_types(context, blocked_types)
+        if cookiebanner:
+            # The banner scripts then run in every document without further round-trips
+            await install_cookie_banner_hiding(context)
         page = await context.new_page()
 
         network_data = []
@@ -158,27 +686,46 @@ async def browse(
         performance_metrics = {}
         downloaded_files = []
 
-        async def log_request(request):
-            try:
-                request_uuid = str(uuid.uuid4())
-                request_uuid_map[request] = request_uuid
-
-                timing = request.timing or {}
-
-                try:
-                    headers = await request.all_headers()
-                except Exception as e:
-                    headers = "Unavailable due to error"
-                    logs.append(
-                        {"warning": f"Failed to fetch request headers: {str(e)}"}
+        # The handlers only record Playwright objects while the page loads; the per-event
+        # round-trips (sizes, security details, server address) are issued in one
+        # concurrent batch once the session is over. Bodies are the exception: Chromium
+        # drops a response's buffered data once the frame commits a new document, so
+        # their fetch is started as soon as the response arrives.
+        observed = []
+
+        def log_request(request):
+            nonlocal network_truncated
+            if len(observed) >= MAX_NETWORK_EVENTS:
+                network_truncated = True
+                return
+
+            request_uuid_map[request] = str(uuid.uuid4())
+            observed.append((request, None, None, datetime.now().isoformat()))
+
+        def log_response(response):
+            nonlocal network_truncated
+            if len(observed) >= MAX_NETWORK_EVENTS:
+                network_truncated = True
+                return
+
+            body_task = None
+            if capture_bodies and response.request.resource_type in BODY_RESOURCE_TYPES:
+                content_length = response.headers.get("content-length", "")
+                if (
+                    not content_length.isdigit()
+                    or int(content_length) <= max_body_bytes
+                ):
+                    body_task = asyncio.ensure_future(response.body())
+                    # Retrieve the exception if the session fails before it is awaited
+                    body_task.add_done_callback(
+                        lambda task: task.cancelled() or task.exception()
                     )
+            observed.append(
+                (response.request, response, body_task, datetime.now().isoformat())
+            )
 
-                try:
-                    cookies = await context.cookies()
-                except Exception as e:
-                    cookies = "Unavailable due to error"
-                    logs.append({"warning": f"Failed to fetch cookies: {str(e)}"})
-
+        async def describe_request(request, request_time):
+            try:
                 redirected_from_url = (
                     request.redirected_from.url if request.redirected_from else None
                 )
@@ -186,21 +733,26 @@ async def browse(
                     request.redirected_to.url if request.redirected_to else None
                 )
 
-                network_data.append(
-                    {
-                        "uuid": request_uuid,
-                        "network": "request",
-                        "url": request.url,
-                        "method": request.method,
-                        "headers": headers,
-                        "cookies": cookies,
-                        "resource_type": request.resource_type,
-                        "redirected_from": redirected_from_url,
-                        "redirected_to": redirected_to_url,
-                        "timing": timing,
-                        "sizes": await request.sizes(),
-                        "request_time": datetime.now().isoformat(),
-                    }
+                # all_headers() includes Cookie and the security headers that the
+                # headers property leaves out.
+                headers, sizes = await asyncio.gather(
+                    asyncio.wait_for(
+                        request.all_headers(), timeout=NETWORK_DETAILS_TIMEOUT
+                    ),
+                    asyncio.wait_for(request.sizes(), timeout=NETWORK_DETAILS_TIMEOUT),
+                )
+
+                return RequestEvent(
+                    uuid=request_uuid_map.get(request),
+                    url=request.url,
+                    method=request.method,
+                    headers=headers,
+                    resource_type=request.resource_type,
+                    redirected_from=redirected_from_url,
+                    redirected_to=redirected_to_url,
+                    timing=request.timing or {},
+                    sizes=sizes,
+                    request_time=request_time,
                 )
 
             except Exception as e:
@@ -208,67 +760,70 @@ async def browse(
                     {"error": f"An error occurred while logging the request: {str(e)}"}
                 )
 
-        async def log_response(response):
+        async def describe_response(response, body_task, response_time):
             try:
                 request = response.request
-                request_uuid = request_uuid_map.get(request)
-
-                timing = request.timing or {}
-
-                try:
-                    request_headers = await request.all_headers()
-                except Exception as e:
-                    request_headers = "Unavailable due to error"
-                    logs.append(
-                        {"warning": f"Failed to fetch request headers: {str(e)}"}
-                    )
-
-                try:
-                    response_headers = await response.all_headers()
-                except Exception as e:
-                    response_headers = "Unavailable due to error"
-                    logs.append(
-                        {"warning": f"Failed to fetch response headers: {str(e)}"}
-                    )
-
-                status_code = response.status
                 response_body = None
                 response_size = 0
 
+                (
+                    response_headers,
+                    request_headers,
+                    security_details,
+                    server_address,
+                ) = await asyncio.gather(
+                    asyncio.wait_for(
+                        response.all_headers(), timeout=NETWORK_DETAILS_TIMEOUT
+                    ),
+                    asyncio.wait_for(
+                        request.all_headers(), timeout=NETWORK_DETAILS_TIMEOUT
+                    ),
+                    response.security_details(),
+                    response.server_addr(),
+                    return_exceptions=True,
+                )
+                if isinstance(response_headers, Exception):
+                    # Without Set-Cookie and the other headers only all_headers() has
+                    response_headers = response.headers
+                if isinstance(request_headers, Exception):
+                    request_headers = request.headers
+
                 try:
-                    content_type = response_headers.get("content-type", "")
-                    if "text" in content_type or "json" in content_type:
-                        response_body = await response.text()
-                        response_size = len(response_body)
-                    else:
-                        body = await response.body()
-                        response_body = base64.b64encode(body).decode("utf-8")
-                        response_size = len(body)
+                    if capture_bodies and request.resource_type in BODY_RESOURCE_TYPES:
+                        content_type = response_headers.get("content-type", "")
+                        if body_task is None:
+                            # Content-Length exceeded the cap, so it was never fetched
+                            response_body = BODY_TOO_LARGE
+                            response_size = int(response_headers["content-length"])
+                        else:
+                            body = await asyncio.wait_for(
+                                body_task, timeout=NETWORK_DETAILS_TIMEOUT
+                            )
+                            response_size = len(body)
+                            if response_size > max_body_bytes:
+                                response_body = BODY_TOO_LARGE
+                            elif "text" in content_type or "json" in content_type:
+                                response_body = body.decode("utf-8", errors="replace")
+                            else:
+                                response_body = pybase64.b64encode_as_string(body)
                 except Exception as e:
                     response_body = "Response body unavailable due to error"
                     logs.append({"warning": f"Failed to fetch response body: {str(e)}"})
 
-                try:
-                    cookies = await context.cookies()
-                except Exception as e:
-                    cookies = "Unavailable due to error"
-                    logs.append({"warning": f"Failed to fetch cookies: {str(e)}"})
-
-                try:
-                    security_details = await response.security_details()
-                except Exception as e:
-                    security_details = "Unavailable due to error"
+                if isinstance(security_details, Exception):
                     logs.append(
-                        {"warning": f"Failed to fetch security details: {str(e)}"}
+                        {
+                            "warning": f"Failed to fetch security details: {str(security_details)}"
+                        }
                     )
-
-                try:
-                    server_address = await response.server_addr()
-                except Exception as e:
-                    server_address = "Unavailable due to error"
+                    security_details = "Unavailable due to error"
+                if isinstance(server_address, Exception):
                     logs.append(
-                        {"warning": f"Failed to fetch server address: {str(e)}"}
+                        {
+                            "warning": f"Failed to fetch server address: {str(server_address)}"
+                        }
                     )
+                    server_address = "Unavailable due to error"
 
                 redirected_to_url = (
                     request.redirected_to.url if request.redirected_to else None
@@ -277,39 +832,23 @@ async def browse(
                     request.redirected_from.url if request.redirected_from else None
                 )
 
-                network_data.append(
-                    {
-                        "uuid": request_uuid,
-                        "network": "response",
-                        "url": response.url,
-                        "status": response.status,
-                        "response_size": response_size,
-                        "cookies": cookies,
-                        "security": security_details,
-                        "server": server_address,
-                        "resource_type": request.resource_type,
-                        "redirected_to": redirected_to_url,
-                        "redirected_from": redirected_from_url,
-                        "timing": timing,
-                        "request_headers": request_headers,
-                        "response_headers": response_headers,
-                        "response_body": response_body,
-                        "response_time": datetime.now().isoformat(),
-                    }
+                return ResponseEvent(
+                    uuid=request_uuid_map.get(request),
+                    url=response.url,
+                    status=response.status,
+                    response_size=response_size,
+                    security=security_details,
+                    server=server_address,
+                    resource_type=request.resource_type,
+                    redirected_to=redirected_to_url,
+                    redirected_from=redirected_from_url,
+                    timing=request.timing or {},
+                    request_headers=request_headers,
+                    response_headers=response_headers,
+                    response_body=response_body,
+                    response_time=response_time,
                 )
 
-                if request.redirected_from:
-                    redirects.append(
-                        {
-                            "step": len(redirects) + 1,
-                            "from": request.redirected_from.url,
-                            "to": request.url,
-                            "status_code": status_code,
-                            "server": server_address,
-                            "resource_type": request.resource_type,
-                        }
-                    )
-
             except Exception as e:
                 logs.append(
                     {"error": f"An error occurred while logging the response: {str(e)}"}
@@ -335,127 +874,171 @@ async def browse(
         async def handle_download(download):
             path = await download.path()
             file_name = download.suggested_filename
-            with open(path, "rb") as f:
-                file_content = base64.b64encode(f.read()).decode("utf-8")
-                downloaded_files.append(
-                    {"file_name": file_name, "file_content": file_content}
+            extension = os.path.splitext(file_name)[1].lstrip(".")
+            stored_name = await run_in_threadpool(
+                store_asset_file, path, extension, DOWNLOADS_DIR
+            )
+            downloaded_file = {
+                "file_name": file_name,
+                "file_url": f"/downloads/{stored_name}",
+                "file_content": None,
+            }
+            if embed_downloads:
+                downloaded_file["file_content"] = await b64encode_file(
+                    os.path.join(DOWNLOADS_DIR, stored_name)
                 )
-            os.remove(path)
+            downloaded_files.append(downloaded_file)
 
-        page.on("download", handle_download)
+        if downloads:
+            page.on("download", handle_download)
 
+        # Network idle is only waited for after navigation, so a page that never goes
+        # idle is still captured (with a warning) rather than failing navigation.
+        goto_wait_until = "load" if wait_until == "networkidle" else wait_until
         try:
             # Navigate to the URL
             if method == "POST" and post_data:
-                await page.goto(url, method=method, post_data=post_data)
-            else:
-                await page.goto(url)
-
-            # Wait for the page to stabilize (with timeout handling)
-            try:
-                await page.wait_for_load_state(
-                    "domcontentloaded", timeout=30000
-                )  # 30 seconds
-            except PlaywrightTimeoutError:
-                logs.append(
-                    {
-                        "warning": "Initial page load timed out, proceeding with current state."
-                    }
+                await page.goto(
+                    url,
+                    method=method,
+                    post_data=post_data,
+                    wait_until=goto_wait_until,
                 )
+            else:
+                await page.goto(url, wait_until=goto_wait_until)
 
-            # Attempt to close cookie banners, if applicable
-            if cookiebanner:
-                await hide_cookie_banners(page)
-
-            # Final wait to ensure the page is stable after banner interaction
-            try:
-                await page.wait_for_load_state("networkidle", timeout=30000)
-            except PlaywrightTimeoutError:
-                logs.append(
-                    {"warning": "Final load state timed out after banner interaction."}
-                )
+            if wait_until == "networkidle":
+                try:
+                    await page.wait_for_load_state("networkidle", timeout=30000)
+                except PlaywrightTimeoutError:
+                    logs.append(
+                        {
+                            "warning": "Network did not go idle, proceeding with current state."
+                        }
+                    )
 
         except PlaywrightTimeoutError:
+            navigation_complete = False
             logs.append({"error": "Overall navigation timed out completely."})
 
         try:
-            await page.wait_for_load_state("load", timeout=30000)
-            title = await page.title()
+            # Navigation may have timed out; give the page one more chance to load
+            await page.wait_for_load_state(goto_wait_until, timeout=30000)
         except PlaywrightTimeoutError:
-            title = "Title unavailable due to load timeout"
             logs.append(
-                {"warning": "Page load timed out, title retrieval may be unstable."}
+                {
+                    "warning": "Page load timed out, title and meta description retrieval may be unstable."
+                }
             )
-        except Exception as e:
-            title = "Title unavailable due to error"
-            logs.append({"error": f"Failed to retrieve title due to error: {str(e)}"})
 
-        try:
-            # Ensure the page is fully loaded, not just network idle
-            await page.wait_for_load_state("load", timeout=30000)
-
-            # Check if the meta description is available, with fallback logging
-            meta_description = await page.locator(
-                "meta[name='description']"
-            ).get_attribute("content")
-            if not meta_description:
-                meta_description = "No Meta Description"
-        except PlaywrightTimeoutError:
-            meta_description = "Meta description unavailable due to load timeout"
+        if cookiebanner:
+            try:
+                await hide_cookie_banners_now(page)
+            except Exception as e:
+                logs.append({"warning": f"Could not hide cookie banners: {str(e)}"})
+
+        async def capture():
+            if not screenshot:
+                return None, None
+            return await capture_screenshot(
+                page, quality=85, thumbnail_size=450, image_format=image_format
+            )
+
+        # These are independent round-trips to the browser, so issue them concurrently
+        page_metadata, performance_timing, cookies, screenshots = await asyncio.gather(
+            page.evaluate(PAGE_METADATA_SCRIPT),
+            page.evaluate("window.performance.timing.toJSON()"),
+            context.cookies(),
+            capture(),
+            return_exceptions=True,
+        )
+
+        if isinstance(page_metadata, Exception):
             logs.append(
                 {
-                    "warning": "Page load timed out, meta description retrieval may be unstable."
+                    "error": f"Failed to retrieve title and meta description due to error: {str(page_metadata)}"
                 }
             )
-        except Exception as e:
+            title = "Title unavailable due to error"
             meta_description = "Meta description unavailable due to error"
-            logs.append(
-                {"error": f"Failed to retrieve meta description due to error: {str(e)}"}
-            )
-
-        # Get performance metrics
-        performance_timing = await page.evaluate("window.performance.timing.toJSON()")
-        performance_metrics["performance_timing"] = performance_timing
+        else:
+            title = page_metadata["title"]
+            meta_description = page_metadata["description"] or "No Meta Description"
 
-        cookies = await context.cookies()
-        # attemt to close cookiebanner
+        # The remaining results are required for the response
+        for result in (performance_timing, cookies, screenshots):
+            if isinstance(result, BaseException):
+                raise result
 
-        # Capture screenshot
-        screenshot = await page.screenshot()
-        image = Image.open(io.BytesIO(screenshot))
-        full_optimized = optimize_image(image, quality=85)
-        thumbnail_image = create_thumbnail(image, max_size=450)
-        screenshot_b64 = base64.b64encode(full_optimized).decode("utf-8")
-        thumbnail_b64 = base64.b64encode(thumbnail_image).decode("utf-8")
+        performance_metrics["performance_timing"] = performance_timing
+        full_optimized, thumbnail_image = screenshots
+        screenshot_file = thumbnail_file = screenshot_b64 = thumbnail_b64 = None
+        if screenshot:
+            extension = IMAGE_EXTENSIONS[image_format]
+            screenshot_file, thumbnail_file = await asyncio.gather(
+                run_in_threadpool(store_asset, full_optimized, extension),
+                run_in_threadpool(store_asset, thumbnail_image, extension),
+            )
+            if embed:
+                screenshot_b64 = pybase64.b64encode_as_string(full_optimized)
+                thumbnail_b64 = pybase64.b64encode_as_string(thumbnail_image)
 
         if scroll:
             await smooth_scroll(page)
 
+        events = await asyncio.gather(
+            *(
+                (
+                    describe_request(request, event_time)
+                    if response is None
+                    else describe_response(response, body_task, event_time)
+                )
+                for request, response, body_task, event_time in observed
+            )
+        )
+        for event in events:
+            if event is None:
+                continue
+            network_data.append(event)
+            if isinstance(event, ResponseEvent) and event.redirected_from:
+                redirects.append(
+                    {
+                        "step": len(redirects) + 1,
+                        "from": event.redirected_from,
+                        "to": event.url,
+                        "status_code": event.status,
+                        "server": event.server,
+                        "resource_type": event.resource_type,
+                    }
+                )
+
         # Close context to save video
         await context.close()
-        await browser.close()
 
-        # Retrieve video path
-        video_file_path = await page.video.path()
+        video_file = video_base64 = None
+        if record_video:
+            # Move the recording into the assets directory
+            video_file = await run_in_threadpool(
+                store_asset_file, await page.video.path(), "webm"
+            )
 
-        # Read and encode the video file
-        with open(video_file_path, "rb") as video_file:
-            video_base64 = base64.b64encode(video_file.read()).decode("utf-8")
+            if embed:
+                video_base64 = await b64encode_file(
+                    os.path.join(ASSETS_DIR, video_file)
+                )
 
-        # Clean up the video file
-        os.remove(video_file_path)
         if not redirects:
             # fixes if no redirects happened. TODO unclean
             for netw in network_data:
-                if netw["network"] == "response":
+                if isinstance(netw, ResponseEvent):
                     redirects.append(
                         {
                             "step": 0,
-                            "from": netw["url"],
-                            "to": netw["url"],
-                            "status_code": netw["status"],
-                            "server": netw["server"],
-                            "resource_type": netw["resource_type"],
+                            "from": netw.url,
+                            "to": netw.url,
+                            "status_code": netw.status,
+                            "server": netw.server,
+                            "resource_type": netw.resource_type,
                         }
                     )
                     break
@@ -465,27 +1048,42 @@ async def browse(
             "page_title": title,
             "meta_description": meta_description,
             "network_data": network_data,
+            "network_data_truncated": network_truncated,
             "logs": logs,
             "cookies": cookies,
             "performance_metrics": performance_metrics,
+            "screenshot_url": asset_url(screenshot_file) if screenshot_file else None,
+            "thumbnail_url": asset_url(thumbnail_file) if thumbnail_file else None,
+            "video_url": asset_url(video_file) if video_file else None,
             "screenshot": screenshot_b64,
             "thumbnail": thumbnail_b64,
             "downloaded_files": downloaded_files,
             "video": video_base64,
         }
 
-        serialized_response_data = json.dumps(response_data)
-        cache.set(cache_key, serialized_response_data, expire=CACHE_EXPIRATION_SECONDS)
-        return JSONResponse(content=response_data)
+        return response_data, navigation_complete
 
 
 @app.get("/screenshot", response_model=ScreenshotResponse, status_code=200)
 async def screenshotter(
+    request: Request,
     url: str,
     full_page: bool = Query(False),
     live: bool = Query(False),
-    thumbnail_size: int = 450,
-    quality: int = 85,
+    thumbnail_size: int = Query(450, gt=0),
+    quality: int = Query(85, gt=0, le=100),
+    embed: bool = Query(False),
+    image_format: Optional[Literal["webp", "jpeg"]] = Query(None),
+    output: Literal["json", "image"] = Query(
+        "json", description="Return JSON with URLs, or the screenshot bytes directly."
+    ),
+    block_resources: str = Query(
+        "image,font,media",
+        description="Comma-separated resource types to abort. Ignored for full-page captures.",
+    ),
+    wait_until: WAIT_UNTIL = Query(
+        "load", description="Load state to wait for before the capture."
+    ),
     credentials: HTTPAuthorizationCredentials = Depends(optional_auth),
 ):
     """
@@ -498,41 +1096,172 @@ async def screenshotter(
         url (str): The URL of the page to capture a screenshot of.
         full_page (bool, optional): Whether to capture the full page or just the visible viewport. Defaults to False.
         live (bool, optional): Whether to skip the cache and take a fresh screenshot. Defaults to False.
+        embed (bool, optional): Whether to also return the images inline as base64. Defaults to False.
+        image_format (str, optional): "webp" or "jpeg". If omitted, WebP is used unless the Accept
+            header lists image types without WebP.
+        output (str, optional): "json" (default) or "image". With "image" the screenshot itself is
+            returned as `image/webp` or `image/jpeg`; no thumbnail is made and nothing is stored.
+        block_resources (str, optional): Comma-separated Playwright resource types whose requests are
+            aborted, "image,font,media" by default. Pass an empty value for a full-fidelity capture.
+            Not applied when `full_page` is set, since images affect the page layout.
+        wait_until (str, optional): Load state to wait for before the capture: "domcontentloaded",
+            "load" (default) or "networkidle".
 
     Returns:
-        JSONResponse: A JSON response containing the base64-encoded screenshot of the page.
+        ORJSONResponse: A JSON response containing URLs of the screenshot and thumbnail of the page,
+        and their base64-encoded contents if `embed` is set.
+        Response: The raw screenshot if `output="image"`.
 
     Raises:
         HTTPException: If there is any issue during the Playwright interaction or screenshot capture.
     """
-    cache_key = generate_cache_key(f"{url}_{full_page}")
-
-    if not live and cache_key in cache:
-        return JSONResponse(content=cache[cache_key])
-
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-        await page.goto(url, wait_until="networkidle")
-        screenshot = await page.screenshot(full_page=full_page)
-        await browser.close()
-
-        image = Image.open(io.BytesIO(screenshot))
-        full_optimized = optimize_image(image, quality=quality)
-        thumbnail_image = create_thumbnail(image, max_size=thumbnail_size)
-        screenshot_b64 = base64.b64encode(full_optimized).decode("utf-8")
-        thumbnail_b64 = base64.b64encode(thumbnail_image).decode("utf-8")
-        images = {
-            "url": page.url,
-            "screenshot": screenshot_b64,
-            "thumbnail": thumbnail_b64,
-            "request_time": datetime.now().isoformat(),
-        }
+    image_format = image_format or negotiate_image_format(request.headers.get("accept"))
+    blocked_types = frozenset() if full_page else parse_resource_types(block_resources)
+    if output == "image":
+        return await _screenshot_image(
+            request,
+            url,
+            full_page,
+            live,
+            quality,
+            image_format,
+            blocked_types,
+            wait_until,
+        )
+
+    cache_key = "screenshot:" + generate_params_key(
+        url=url,
+        full_page=full_page,
+        thumbnail_size=thumbnail_size,
+        quality=quality,
+        embed=embed,
+        image_format=image_format,
+        blocked_types=sorted(blocked_types),
+        wait_until=wait_until,
+    )
+
+    if not live:
+        cached = cache.get(cache_key, default=_MISS)
+        if cached is not _MISS:
+            return await cached_json_response(request, cached, CACHE_TTL["screenshot"])
+
+    async def take_screenshot():
+        async with browser_context() as context:
+            await block_resource_types(context, blocked_types)
+            page = await context.new_page()
+            await page.goto(url, wait_until=wait_until)
+            full_optimized, thumbnail_image = await capture_screenshot(
+                page,
+                full_page=full_page,
+                quality=quality,
+                thumbnail_size=thumbnail_size,
+                image_format=image_format,
+            )
+            await context.close()
+
+            extension = IMAGE_EXTENSIONS[image_format]
+            screenshot_file, thumbnail_file = await asyncio.gather(
+                run_in_threadpool(store_asset, full_optimized, extension),
+                run_in_threadpool(store_asset, thumbnail_image, extension),
+            )
+            images = {
+                "url": page.url,
+                "screenshot_url": asset_url(screenshot_file),
+                "thumbnail_url": asset_url(thumbnail_file),
+                "screenshot": None,
+                "thumbnail": None,
+                "request_time": datetime.now().isoformat(),
+            }
+            if embed:
+                images["screenshot"] = pybase64.b64encode_as_string(full_optimized)
+                images["thumbnail"] = pybase64.b64encode_as_string(thumbnail_image)
+
+        stored = await compress_json(orjson.dumps(images))
+        if not live:
+            cache.set(
+                cache_key, stored, expire=CACHE_TTL["screenshot"], tag="screenshot"
+            )
+        return stored
+
+    stored = await singleflight(f"{cache_key}:{live}", take_screenshot)
+    return await cached_json_response(request, stored, CACHE_TTL["screenshot"])
+
+
+async def _screenshot_image(
+    request,
+    url,
+    full_page,
+    live,
+    quality,
+    image_format,
+    blocked_types,
+    wait_until,
+):
+    """
+    Serves /screenshot?output=image: the encoded screenshot as the response body, cached
+    as raw bytes under its own key.
+    """
+    media_type = f"image/{image_format}"
+    cache_key = (
+        "screenshot:"
+        + generate_params_key(
+            url=url,
+            full_page=full_page,
+            quality=quality,
+            image_format=image_format,
+            blocked_types=sorted(blocked_types),
+            wait_until=wait_until,
+        )
+        + ":bin"
+    )
 
     if not live:
-        cache.set(cache_key, images, expire=CACHE_EXPIRATION_SECONDS)
+        cached = cache.get(cache_key, default=_MISS)
+        if cached is not _MISS:
+            headers = cache_headers(
+                generate_cache_key(cached), CACHE_TTL["screenshot"], vary="Accept"
+            )
+            return not_modified(request, headers) or Response(
+                content=cached, media_type=media_type, headers=headers
+            )
+
+    async def take_screenshot():
+        async with browser_context() as context:
+            await block_resource_types(context, blocked_types)
+            page = await context.new_page()
+            await page.goto(url, wait_until=wait_until)
+            image, _ = await capture_screenshot(
+                page,
+                full_page=full_page,
+                quality=quality,
+                thumbnail_size=None,
+                image_format=image_format,
+            )
+
+        if not live:
+            cache.set(
+                cache_key, image, expire=CACHE_TTL["screenshot"], tag="screenshot"
+            )
+        return image
+
+    image = await singleflight(f"{cache_key}:{live}", take_screenshot)
+    return Response(
+        content=image,
+        media_type=media_type,
+        headers=cache_headers(
+            generate_cache_key(image), CACHE_TTL["screenshot"], vary="Accept"
+        ),
+    )
+
 
-    return JSONResponse(content=images)
+def _minify(html: str) -> str:
+    return minify_html.minify(
+        html,
+        minify_css=False,
+        minify_js=False,
+        keep_closing_tags=True,
+        do_not_minify_doctype=True,
+    )
 
 
 @app.post("/minimize", response_model=MinimizeHTMLResponse, status_code=200)
@@ -543,9 +1272,11 @@ async def minimize_html(
     """
     Minimize the given HTML content by removing unnecessary comments and whitespace.
 
-    The HTML content provided in the `html` form field is minimized using the `htmlmin` library,
+    The HTML content provided in the `html` form field is minimized using the `minify-html` library,
     which removes comments and extra spaces. If the minimized HTML is cached, the cached version is returned.
-    Otherwise, the HTML is minimized, cached, and returned.
+    Otherwise, the HTML is minimized, cached, and returned. Very large inputs that cannot be minimized
+    within `MINIFY_BUDGET_SECONDS` are returned unchanged; their minification carries on in the
+    background and is cached once it completes.
 
     Args:
         html (str): The HTML content to be minimized, provided as a form field.
@@ -563,13 +1294,64 @@ async def minimize_html(
         }
     """
 
-    cache_key = generate_cache_key(html)
-    if cache_key in cache:
-        return JSONResponse(content={"minified_html": cache[cache_key]})
+    html_hash = generate_cache_key(html)
+    headers = cache_headers(html_hash, CACHE_TTL["minimize"])
+
+    cache_key = f"minimize:{html_hash}"
+    cached = cache.get(cache_key, default=_MISS)
+    if cached is not _MISS:
+        return ORJSONResponse(content=cached, headers=headers)
+
+    async def minify_and_cache():
+        payload = {"minified_html": await run_cpu_bound(_minify, html)}
+        cache.set(cache_key, payload, expire=CACHE_TTL["minimize"], tag="minimize")
+        return payload
+
+    def forget(task):
+        del _minify_tasks[cache_key]
+        if not task.cancelled():
+            # Retrieved, so a failure after the budget ran out is not logged as unhandled
+            task.exception()
+
+    async def minify():
+        if len(html) <= MINIFY_BUDGET_THRESHOLD:
+            return await minify_and_cache()
+        task = _minify_tasks.get(cache_key)
+        if task is None:
+            task = asyncio.ensure_future(minify_and_cache())
+            _minify_tasks[cache_key] = task
+            task.add_done_callback(forget)
+        try:
+            # Shielded: the worker cannot be interrupted, so let it finish and cache
+            return await asyncio.wait_for(
+                asyncio.shield(task), timeout=MINIFY_BUDGET_SECONDS
+            )
+        except asyncio.TimeoutError:
+            return {"minified_html": html}
+
+    # A new response per caller: the compression middleware rewrites its headers
+    payload = await singleflight(cache_key, minify)
+    return ORJSONResponse(content=payload, headers=headers)
+
+
+# Elements whose text is code or markup rather than readable content.
+NON_TEXT_TAGS = ["script", "style", "template"]
 
-    minified_html = htmlmin.minify(html, remove_comments=True, remove_empty_space=True)
-    cache.set(cache_key, minified_html, expire=CACHE_EXPIRATION_SECONDS)
-    return MinimizeHTMLResponse(minified_html=minified_html)
+
+def _extract_text(html: str) -> str:
+    # Same output as BeautifulSoup's get_text(separator=" ", strip=True) without the
+    # scripts: every non-blank text node of the document, stripped, joined by a space.
+    # Walking the text nodes stays linear in the document size.
+    tree = LexborHTMLParser(html)
+    if tree.root is None:
+        return ""
+    tree.strip_tags(NON_TEXT_TAGS)
+    texts = (
+        node.text_content.strip()
+        for node in tree.root.traverse(include_text=True)
+        if node.tag == "-text"
+    )
+    return " ".join(text for text in texts if text)
 
 
 @app.post("/extract_text", response_model=ExtractTextResponse, status_code=200)
@@ -580,8 +1362,8 @@ async def extract_text_from_html(
     """
     Extract plain text from the provided HTML content.
 
-    The HTML content provided in the `html` form field is parsed using `BeautifulSoup`
-    to extract the plain text, removing all HTML tags and formatting. If the text is cached,
+    The HTML content provided in the `html` form field is parsed off the event loop using
+    `selectolax` (Lexbor) to extract the plain text, removing all HTML tags and formatting. If the text is cached,
     the cached version is returned. Otherwise, the plain text is extracted, cached, and returned.
 
     Args:
@@ -599,21 +1381,48 @@ async def extract_text_from_html(
             "text": "string"
         }
     """
-    cache_key = generate_cache_key(html)
+    html_hash = generate_cache_key(html)
+    headers = cache_headers(html_hash, CACHE_TTL["extract_text"])
+
+    cache_key = f"extract_text:{html_hash}"
+    cached = cache.get(cache_key, default=_MISS)
+    if cached is not _MISS:
+        return ORJSONResponse(content=cached, headers=headers)
+
+    async def extract():
+        text_content = await run_cpu_bound(_extract_text, html)
+        payload = {"text": text_content}
+        cache.set(
+            cache_key, payload, expire=CACHE_TTL["extract_text"], tag="extract_text"
+        )
+        return payload
 
-    if cache_key in cache:
-        return JSONResponse(content={"text": cache[cache_key]})
+    payload = await singleflight(cache_key, extract)
+    return ORJSONResponse(content=payload, headers=headers)
 
-    soup = BeautifulSoup(html, "html.parser")
-    text_content = soup.get_text(separator=" ", strip=True)
-    cache.set(cache_key, text_content, expire=CACHE_EXPIRATION_SECONDS)
-    return ExtractTextResponse(text=text_content)
+
+def _read(html: str) -> dict:
+    # trafilatura finds the title and main content in one pass; readability scores the
+    # document again for each of summary() and title(), so it is only the fallback.
+    # Both return HTML, the title travelling in trafilatura's <meta name="title">.
+    extracted = trafilatura.extract(
+        html, output_format="html", include_comments=False, with_metadata=True
+    )
+    if extracted:
+        tree = LexborHTMLParser(extracted)
+        meta = tree.css_first('meta[name="title"]')
+        title = meta.attributes.get("content") if meta else None
+        return {"title": title or "", "content": tree.body.html}
+
+    doc = Document(html)
+    return {"title": doc.title(), "content": doc.summary()}
 
 
 @app.post("/reader", response_model=ReaderResponse)
 async def html_to_reader(html: str = Form(...)):
     """
-    Extracts the main readable content and title from the provided HTML using the readability library.
+    Extracts the main readable content and title from the provided HTML using trafilatura, falling
+    back to the readability library if nothing is extracted. Results are cached by a hash of the HTML.
 
     Parameters:
     - **html**: The raw HTML content provided via a form field.
@@ -624,17 +1433,35 @@ async def html_to_reader(html: str = Form(...)):
     if not html:
         raise HTTPException(status_code=400, detail="No HTML content provided")
 
-    doc = Document(html)
-    reader_content = doc.summary()
-    title = doc.title()
+    html_hash = generate_cache_key(html)
+    headers = cache_headers(html_hash, CACHE_TTL["reader"])
+
+    cache_key = f"reader:{html_hash}"
+    cached = cache.get(cache_key, default=_MISS)
+    if cached is not _MISS:
+        return ORJSONResponse(content=cached, headers=headers)
 
-    return ReaderResponse(title=title, content=reader_content)
+    async def read():
+        payload = await run_cpu_bound(_read, html)
+        cache.set(cache_key, payload, expire=CACHE_TTL["reader"], tag="reader")
+        return payload
+
+    payload = await singleflight(cache_key, read)
+    return ORJSONResponse(content=payload, headers=headers)
+
+
+def _to_markdown(html: str) -> str:
+    # HTML2Text keeps per-document parser state on the instance, and this runs in
+    # threadpool workers concurrently, so each call gets its own converter.
+    markdown_converter = html2text.HTML2Text()
+    markdown_converter.ignore_links = False
+    return markdown_converter.handle(html)
 
 
 @app.post("/markdown", response_model=MarkdownResponse)
 async def html_to_markdown(html: str = Form(...)):
     """
-    Convert the provided HTML content into Markdown format.
+    Convert the provided HTML content into Markdown format. Results are cached by a hash of the HTML.
 
     ### Parameters:
     - **html**: The raw HTML content provided via a form field.
@@ -645,11 +1472,151 @@ async def html_to_markdown(html: str = Form(...)):
     if not html:
         raise HTTPException(status_code=400, detail="No HTML content provided")
 
-    markdown_converter = html2text.HTML2Text()
-    markdown_converter.ignore_links = False
-    markdown_content = markdown_converter.handle(html)
+    html_hash = generate_cache_key(html)
+    headers = cache_headers(html_hash, CACHE_TTL["markdown"])
+
+    cache_key = f"markdown:{html_hash}"
+    cached = cache.get(cache_key, default=_MISS)
+    if cached is not _MISS:
+        return ORJSONResponse(content=cached, headers=headers)
+
+    async def convert():
+        markdown_content = await run_cpu_bound(_to_markdown, html)
+        payload = {"markdown": markdown_content}
+        cache.set(cache_key, payload, expire=CACHE_TTL["markdown"], tag="markdown")
+        return payload
+
+    payload = await singleflight(cache_key, convert)
+    return ORJSONResponse(content=payload, headers=headers)
+
+
+@app.post("/batch", response_model=BatchResponse)
+async def batch(
+    request: Request,
+    payload: BatchRequest,
+    credentials: HTTPAuthorizationCredentials = Depends(optional_auth),
+):
+    """
+    Runs several /browse and /screenshot requests concurrently in one round-trip.
+    They share the browser pool, cache and in-flight deduplication with the single endpoints.
 
-    return MarkdownResponse(markdown=markdown_content)
+    ### Parameters:
+    - **requests**: (List) Up to `MAX_BATCH_SIZE` items. Each has an `endpoint` ("browse" or
+      "screenshot") and that endpoint's query parameters as fields, e.g.
+      `{"endpoint": "screenshot", "url": "https://example.com", "full_page": true}`.
+      Screenshots are always returned as JSON.
+
+    ### Returns:
+    - **BatchResponse**: One result per item, in order, each with the `status_code` and `body`
+      the endpoint would have returned. A failing item does not affect the others.
+    """
+    if len(payload.requests) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {MAX_BATCH_SIZE} requests are allowed per batch",
+        )
+
+    # Items see this POST, so If-None-Match never turns one of them into a 304
+    results = await asyncio.gather(
+        *(_batch_item(request, item) for item in payload.requests)
+    )
+    return json_bytes_response(orjson.dumps({"results": results}))
+
+
+async def _batch_item(request: Request, item):
+    params = item.model_dump(exclude={"endpoint"})
+    if item.endpoint == "browse" and params["max_body_bytes"] is None:
+        params["max_body_bytes"] = MAX_BODY_BYTES
+    try:
+        if item.endpoint == "browse":
+            response = await browse(request, **params, credentials=None)
+        else:
+            response = await screenshotter(
+                request, **params, output="json", credentials=None
+            )
+    except HTTPException as e:
+        return {"status_code": e.status_code, "body": {"detail": e.detail}}
+    except playwright_errors.Error as e:
+        return {
+            "status_code": 502,
+            "body": {"detail": f"Error browsing the page: {str(e)}"},
+        }
+    except Exception as e:
+        # Anything else (image encoding, storing assets) fails this item only
+        return {"status_code": 500, "body": {"detail": str(e)}}
+
+    body = response.body
+    if response.headers.get("content-encoding") == "gzip":
+        body = await run_in_threadpool(gzip.decompress, body)
+    # Embedded as-is, so cached results are not parsed and serialized again
+    return {"status_code": response.status_code, "body": orjson.Fragment(body)}
+
+
+CACHE_TAGS = Literal[
+    "browse", "screenshot", "minimize", "extract_text", "reader", "markdown"
+]
+
+
+@app.delete("/cache/{tag}", response_model=CacheEvictResponse)
+async def evict_cache(
+    tag: CACHE_TAGS,
+    credentials: HTTPAuthorizationCredentials = Depends(require_api_key),
+):
+    """
+    Removes every cached result of one endpoint, leaving the other endpoints' entries intact.
+    Always requires the API key, and is disabled when no API_KEY is configured.
+
+    ### Parameters:
+    - **tag**: The endpoint whose entries are evicted, e.g. `browse` or `screenshot`.
+
+    ### Returns:
+    - **CacheEvictResponse**: The tag and the number of entries removed.
+    """
+    evicted = await run_in_threadpool(cache.evict, tag)
+    return {"tag": tag, "evicted": evicted}
+
+
+@app.get("/assets/{filename}", response_class=FileResponse)
+async def assets(
+    filename: str,
+    credentials: HTTPAuthorizationCredentials = Depends(optional_auth),
+):
+    """
+    Serves a screenshot, thumbnail or video stored by /browse or /screenshot.
+
+    ### Parameters:
+    - **filename**: The `<sha256>.<ext>` name from a `screenshot_url`, `thumbnail_url` or `video_url`.
+
+    ### Returns:
+    - The stored file.
+    """
+    return FileResponse(
+        stored_file_path(ASSETS_DIR, filename),
+        headers={"X-Content-Type-Options": "nosniff"},
+    )
+
+
+@app.get("/downloads/{filename}", response_class=FileResponse)
+async def downloads(
+    filename: str,
+    credentials: HTTPAuthorizationCredentials = Depends(optional_auth),
+):
+    """
+    Serves a file downloaded during a /browse session. The file and its extension come
+    from the browsed site, so it is always sent as an opaque attachment, never rendered.
+
+    ### Parameters:
+    - **filename**: The `<sha256>.<ext>` name from a `file_url`.
+
+    ### Returns:
+    - The stored file.
+    """
+    return FileResponse(
+        stored_file_path(DOWNLOADS_DIR, filename),
+        media_type="application/octet-stream",
+        filename=filename,
+        headers={"X-Content-Type-Options": "nosniff"},
+    )
 
 
 @app.get("/video", response_class=FileResponse)
@@ -672,34 +1639,35 @@ async def video(
     - The recorded video file of the browsing session.
     """
 
-    async with async_playwright() as p:
-        browser_type = getattr(p, browser_name, None)
-        if browser_type is None:
-            raise HTTPException(
-                status_code=400, detail=f'Browser "{browser_name}" is not supported'
-            )
+    if browser_name not in SUPPORTED_BROWSERS:
+        raise HTTPException(
+            status_code=400, detail=f'Browser "{browser_name}" is not supported'
+        )
 
-        video_dir = os.path.join(os.getcwd(), "videos")
-        os.makedirs(video_dir, exist_ok=True)
-        video_filename = url_to_sha256_filename(url)
+    video_dir = os.path.join(os.getcwd(), "videos")
+    os.makedirs(video_dir, exist_ok=True)
+    video_filename = url_to_sha256_filename(url)
 
-        browser = await browser_type.launch(headless=True)
-        context = await browser.new_context(
+    async def record():
+        async with browser_context(
+            browser_name,
             record_video_dir=video_dir,
             record_video_size={"width": width, "height": height},
-        )
-        page = await context.new_page()
+        ) as context:
+            page = await context.new_page()
 
-        try:
-            await page.goto(url, wait_until="networkidle")
-        except Exception as e:
-            raise HTTPException(
-                status_code=500, detail=f"Error navigating to the page: {str(e)}"
-            )
+            try:
+                await page.goto(url, wait_until="networkidle")
+            except Exception as e:
+                raise HTTPException(
+                    status_code=500, detail=f"Error navigating to the page: {str(e)}"
+                )
 
-        await context.close()
-        video_path = await page.video.path()
-        await browser.close()
-        return FileResponse(
-            video_path, media_type="video/webm", filename=video_filename
-        )
+            await context.close()
+            return await page.video.path()
+
+    video_key = generate_params_key(
+        url=url, browser_name=browser_name, width=width, height=height
+    )
+    video_path = await singleflight(f"video:{video_key}", record)
+    return FileResponse(video_path, media_type="video/webm", filename=video_filename)
@@ -1,23 +1,78 @@
 import os
-from diskcache import Cache
+from diskcache import FanoutCache
 from fastapi.security import HTTPBearer
 from utils import load_env_file
 import hashlib
+import json
+from functools import lru_cache
 
 
+@lru_cache(maxsize=4096)
 def url_to_sha256_filename(url: str, extension: str = "webm") -> str:
-    sha256_hash = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    # The hash only disambiguates filenames, so a 128-bit BLAKE2b is plenty and cheaper
+    # than SHA-256. The function keeps its name for existing callers.
+    url_hash = hashlib.blake2b(url.encode("utf-8"), digest_size=16).hexdigest()
     base_name = url.split("://")[-1].split("/")[0]
     base_name = base_name.replace(":", "_").replace("/", "_")
-    filename = f"{base_name}_{sha256_hash}.{extension}"
+    filename = f"{base_name}_{url_hash}.{extension}"
     return filename
 
 
+def _ttl_from_env(name: str, default):
+    """
+    Reads a cache TTL in seconds from the environment. The value "none" disables expiry.
+    """
+    value = os.getenv(name)
+    if value is None:
+        return default
+    if value.lower() == "none":
+        return None
+    return int(value)
+
+
 def setup_configurations():
     load_env_file()
 
-    cache = Cache("./cache")
-    cache_expiration_seconds = int(os.getenv("CACHE_EXPIRATION_SECONDS", 3600))
+    # Sharded across several SQLite files so concurrent writers do not serialize on a
+    # single lock. Entries are tagged by endpoint so one class can be flushed with
+    # cache.evict(tag). The size limit is split evenly between the shards.
+    cache = FanoutCache(
+        "./cache",
+        shards=int(os.getenv("CACHE_SHARDS", 8)),
+        timeout=1,
+        size_limit=int(os.getenv("CACHE_SIZE_LIMIT", 10 * 1024**3)),
+        eviction_policy=os.getenv("CACHE_EVICTION_POLICY", "least-recently-used"),
+        tag_index=True,
+    )
+
+    # Per-endpoint cache TTLs in seconds. Browse results go stale quickly, screenshots age
+    # more slowly, and the HTML endpoints are keyed by a hash of their input, so their
+    # results never go stale and are kept until evicted.
+    content_ttl = _ttl_from_env("CACHE_TTL_CONTENT", None)
+    cache_ttl = {
+        "browse": _ttl_from_env("CACHE_TTL_BROWSE", 30),
+        # Last good /browse result, served when a fresh Playwright session fails.
+        "browse_stale": _ttl_from_env("CACHE_TTL_BROWSE_STALE", 86400),
+        "screenshot": _ttl_from_env(
+            "CACHE_TTL_SCREENSHOT", int(os.getenv("CACHE_EXPIRATION_SECONDS", 600))
+        ),
+        "minimize": content_ttl,
+        "extract_text": content_ttl,
+        "reader": content_ttl,
+        "markdown": content_ttl,
+    }
+    # Screenshots, thumbnails and videos under ./storage, and downloads under ./downloads,
+    # are pruned once no cached result can reference them any more; by default that is
+    # the longest TTL pointing at them.
+    asset_ttls = (
+        cache_ttl["browse"],
+        cache_ttl["browse_stale"],
+        cache_ttl["screenshot"],
+    )
+    cache_ttl["assets"] = _ttl_from_env(
+        "ASSET_RETENTION_SECONDS",
+        None if None in asset_ttls else max(asset_ttls),
+    )
 
     playwright_browsers_path = os.getenv("PLAYWRIGHT_BROWSERS_PATH", "0")
     if playwright_browsers_path != "0":
@@ -26,271 +81,229 @@ def setup_configurations():
     api_key = os.environ.get("API_KEY", "none")
     security = HTTPBearer(auto_error=False)
 
-    return cache, cache_expiration_seconds, security, api_key
+    return cache, cache_ttl, security, api_key
+
+
+COOKIE_BANNER_SELECTORS = (
+    # IDs and classes containing 'cookie', 'consent', 'gdpr', etc.
+    "[id*='cookie']",
+    "[class*='cookie']",
+    "[id*='consent']",
+    "[class*='consent']",
+    "[id*='gdpr']",
+    "[class*='gdpr']",
+    "[id*='eprivacy']",
+    "[class*='eprivacy']",
+    "[id*='eu-cookie']",
+    "[class*='eu-cookie']",
+    "[id*='alert']",
+    "[class*='alert']",
+    "[id*='notice']",
+    "[class*='notice']",
+    "[id*='banner']",
+    "[class*='banner']",
+    "[id*='popup']",
+    "[class*='popup']",
+    "[id*='message']",
+    "[class*='message']",
+    "[id*='overlay']",
+    "[class*='overlay']",
+    "[aria-label*='cookie']",
+    "[aria-label*='consent']",
+    "[aria-label*='gdpr']",
+    "[role='dialog']",
+    "[role='alertdialog']",
+    ".modal",
+    ".overlay",
+    ".popup",
+    ".cookie-banner",
+    ".cookie-consent",
+    ".cookie-container",
+    ".consent-banner",
+    ".consent-message",
+    ".cc-window",
+    ".cc-banner",
+    ".cookie-notice",
+    ".gdpr-banner",
+    ".alert",
+    ".notification",
+    ".privacy-message",
+    ".qc-cmp-ui",  # Quantcast CMP
+    "#usercentrics-root",  # Usercentrics CMP
+    "#onetrust-banner-sdk",  # OneTrust CMP
+    # Add more selectors as needed
+)
+
+# Built once at import; every call only pays for the page.evaluate round-trip
+COMBINED_COOKIE_BANNER_SELECTORS = ", ".join(COOKIE_BANNER_SELECTORS)
+
+HIDE_COOKIE_BANNERS_SCRIPT = f"""
+(function() {{
+    const selectors = `{COMBINED_COOKIE_BANNER_SELECTORS}`;
+    const elements = document.querySelectorAll(selectors);
+    elements.forEach(function(el) {{
+        el.style.display = 'none';
+        el.style.visibility = 'hidden';
+    }});
+}})();
+"""
+
+# Slower pass that also looks into shadow roots and same-origin iframes, and only hides
+# elements that look like consent banners. Takes COMBINED_COOKIE_BANNER_SELECTORS as its
+# argument so each root is queried once, and runs 1.5 s after the DOM is ready unless
+# `immediate` is set.
+HIDE_COOKIE_BANNERS_DEEP_SCRIPT = """
+(selectors, immediate = false) => {
+    function hideCookieBanners() {
+
+        // Built once per call; single words are looked up per token, phrases by substring
+        const consentWords = new Set([
+            'cookie', 'cookies', 'consent', 'gdpr', 'privacy', 'accept', 'agree', 'allow',
+            'подробнее', 'weiterlesen', 'chiudi', 'schließen', 'close'
+        ]);
+        const consentPhrases = [
+            'your experience', 'more information', 'learn more', '了解更多', 'más información',
+            "plus d'informations", 'maggiori informazioni', 'meer informatie', 'sapere di più'
+        ];
+
+        function hasConsentText(node) {
+        // Ancestors can hold the whole page, so only their leading text is considered
+        const text = node.textContent.slice(0, 2000).toLowerCase();
+        if (text.split(/[^\\p{L}\\p{N}]+/u, 200).some(word => consentWords.has(word))) {
+            return true;
+        }
+        return consentPhrases.some(phrase => text.includes(phrase));
+        }
+
+        function isCookieBanner(el) {
+        if (!el || el === document.documentElement) return false;
+
+        const style = window.getComputedStyle(el);
+        if (style.display === 'none' || style.visibility === 'hidden' || el.offsetHeight === 0 || el.offsetWidth === 0) {
+            return false;
+        }
+
+        // Check the element and up to three ancestors in a single upward walk
+        for (let node = el, depth = 0; node && node !== document.documentElement && depth < 4; node = node.parentElement, depth++) {
+            if (hasConsentText(node)) {
+            return true;
+            }
+        }
+
+        return false;
+        }
+
+        function hideElements(elements) {
+        for (const el of elements) {
+            try {
+            el.style.display = 'none';
+            el.style.visibility = 'hidden';
+            console.log('Hid cookie banner element:', el);
+            } catch (e) {
+            console.warn('Failed to hide element:', el, e);
+            }
+        }
+        }
+
+        function getAllElementsWithSelectors(root, selectors) {
+        // One tree walk for the combined selector; the result has no duplicates
+        return Array.from(root.querySelectorAll(selectors));
+        }
+
+        function traverseShadowDOM(root) {
+        let elements = [];
+        function traverse(node) {
+            if (node.shadowRoot) {
+            elements = elements.concat(getAllElementsWithSelectors(node.shadowRoot, selectors));
+            traverse(node.shadowRoot);
+            }
+            node.childNodes.forEach(child => {
+            if (child.nodeType === Node.ELEMENT_NODE) {
+                traverse(child);
+            }
+            });
+        }
+        traverse(root);
+        return elements;
+        }
+
+        function hideCookieBannersInRoot(root) {
+        // Find elements matching selectors
+        let elements = getAllElementsWithSelectors(root, selectors);
+
+        // Include elements found in Shadow DOM
+        elements = elements.concat(traverseShadowDOM(root));
+
+        // Filter elements that are likely to be cookie banners
+        elements = elements.filter(el => isCookieBanner(el));
+
+        // Hide identified elements
+        hideElements(elements);
+        }
+
+        function hideCookieBanners() {
+        // Hide cookie banners in the main document
+        hideCookieBannersInRoot(document);
+
+        // Hide cookie banners in iframes (same-origin only)
+        const iframes = document.getElementsByTagName('iframe');
+        for (const iframe of iframes) {
+            try {
+            const iframeDoc = iframe.contentDocument || iframe.contentWindow.document;
+            if (iframeDoc) {
+                hideCookieBannersInRoot(iframeDoc);
+            }
+            } catch (e) {
+            // Ignore cross-origin iframes
+            }
+        }
+        }
+
+        // Run the function after ensuring the DOM is loaded
+        if (immediate) {
+        hideCookieBanners();
+        } else if (document.readyState === 'complete' || document.readyState === 'interactive') {
+        setTimeout(hideCookieBanners, 1500); // Wait 1.5 seconds for dynamic content
+        } else {
+        document.addEventListener('DOMContentLoaded', function() {
+            setTimeout(hideCookieBanners, 1500); // Wait 1.5 seconds after DOM content is loaded
+        });
+        }
+    }
+
+    hideCookieBanners();
+}
+"""
+
+# Registered once per context via add_init_script: every document then hides banners on
+# its own once its DOM is ready, with no evaluate round-trips from Python.
+COOKIE_BANNER_INIT_SCRIPT = f"""
+document.addEventListener('DOMContentLoaded', () => {{
+{HIDE_COOKIE_BANNERS_SCRIPT}
+}});
+({HIDE_COOKIE_BANNERS_DEEP_SCRIPT})({json.dumps(COMBINED_COOKIE_BANNER_SELECTORS)});
+"""
+
+
+async def install_cookie_banner_hiding(context):
+    """
+    Makes every page opened in the Playwright `context` hide cookie banners by itself.
+    Must be called before the pages navigate.
+    """
+    await context.add_init_script(script=COOKIE_BANNER_INIT_SCRIPT)
 
 
-async def hide_cookie_banners(page):
-    """
-    Hides cookie banners on a webpage by injecting CSS styles that target common cookie banner elements.
+# Both passes at once in the current document, without waiting for the deep pass that
+# COOKIE_BANNER_INIT_SCRIPT schedules.
+HIDE_COOKIE_BANNERS_NOW_SCRIPT = f"""() => {{
+{HIDE_COOKIE_BANNERS_SCRIPT}
+({HIDE_COOKIE_BANNERS_DEEP_SCRIPT})({json.dumps(COMBINED_COOKIE_BANNER_SELECTORS)}, true);
+}}"""
 
-    Parameters:
-    - page: Playwright Page object
 
-    Returns:
-    - None
+async def hide_cookie_banners_now(page):
     """
-    selectors = [
-        # IDs and classes containing 'cookie', 'consent', 'gdpr', etc.
-        "[id*='cookie']",
-        "[class*='cookie']",
-        "[id*='consent']",
-        "[class*='consent']",
-        "[id*='gdpr']",
-        "[class*='gdpr']",
-        "[id*='eprivacy']",
-        "[class*='eprivacy']",
-        "[id*='eu-cookie']",
-        "[class*='eu-cookie']",
-        "[id*='alert']",
-        "[class*='alert']",
-        "[id*='notice']",
-        "[class*='notice']",
-        "[id*='banner']",
-        "[class*='banner']",
-        "[id*='popup']",
-        "[class*='popup']",
-        "[id*='message']",
-        "[class*='message']",
-        "[id*='overlay']",
-        "[class*='overlay']",
-        "[aria-label*='cookie']",
-        "[aria-label*='consent']",
-        "[aria-label*='gdpr']",
-        "[role='dialog']",
-        "[role='alertdialog']",
-        ".modal",
-        ".overlay",
-        ".popup",
-        ".cookie-banner",
-        ".cookie-consent",
-        ".cookie-container",
-        ".consent-banner",
-        ".consent-message",
-        ".cc-window",
-        ".cc-banner",
-        ".cookie-notice",
-        ".gdpr-banner",
-        ".alert",
-        ".notification",
-        ".privacy-message",
-        ".qc-cmp-ui",  # Quantcast CMP
-        "#usercentrics-root",  # Usercentrics CMP
-        "#onetrust-banner-sdk",  # OneTrust CMP
-        # Add more selectors as needed
-    ]
-
-    # Combine selectors into a single CSS selector
-    combined_selectors = ", ".join(selectors)
-
-    # JavaScript code to hide elements matching the selectors
-    hide_script = f"""
-    (function() {{
-        const selectors = `{combined_selectors}`;
-        const elements = document.querySelectorAll(selectors);
-        elements.forEach(function(el) {{
-            el.style.display = 'none';
-            el.style.visibility = 'hidden';
-        }});
-    }})();
+    Hides the cookie banners currently on `page`, e.g. right before a capture that may
+    come earlier than the deep pass scheduled by install_cookie_banner_hiding.
     """
-
-    try:
-        # Inject the script into the page
-        await page.evaluate(hide_script)
-        print("Injected script to hide cookie banners.")
-    except Exception as e:
-        print(f"Error hiding cookie banners: {e}")
-
-    try:
-        await page.evaluate("""                            
-            (function() {
-                function hideCookieBanners() {
-                    // List of common selectors for cookie banners
-                    const selectors = [
-                    // IDs and classes containing 'cookie', 'consent', 'gdpr', etc.
-                    "[id*='cookie']",
-                    "[class*='cookie']",
-                    "[id*='consent']",
-                    "[class*='consent']",
-                    "[id*='gdpr']",
-                    "[class*='gdpr']",
-                    "[id*='eprivacy']",
-                    "[class*='eprivacy']",
-                    "[id*='eu-cookie']",
-                    "[class*='eu-cookie']",
-                    "[id*='alert']",
-                    "[class*='alert']",
-                    "[id*='notice']",
-                    "[class*='notice']",
-                    "[id*='banner']",
-                    "[class*='banner']",
-                    "[id*='popup']",
-                    "[class*='popup']",
-                    "[id*='message']",
-                    "[class*='message']",
-                    "[id*='overlay']",
-                    "[class*='overlay']",
-                    "[aria-label*='cookie']",
-                    "[aria-label*='consent']",
-                    "[aria-label*='gdpr']",
-                    "[role='dialog']",
-                    "[role='alertdialog']",
-                    ".modal",
-                    ".overlay",
-                    ".popup",
-                    ".cookie-banner",
-                    ".cookie-consent",
-                    ".cookie-container",
-                    ".consent-banner",
-                    ".consent-message",
-                    ".cc-window",
-                    ".cc-banner",
-                    ".cookie-notice",
-                    ".gdpr-banner",
-                    ".alert",
-                    ".notification",
-                    ".privacy-message",
-                    ".qc-cmp-ui",        // Quantcast CMP
-                    "#usercentrics-root", // Usercentrics CMP
-                    "#onetrust-banner-sdk", // OneTrust CMP
-                    // Add more selectors as needed
-                    ];
-
-                    function isCookieBanner(el) {
-                    if (!el || el === document.documentElement) return false;
-
-                    const style = window.getComputedStyle(el);
-                    if (style.display === 'none' || style.visibility === 'hidden' || el.offsetHeight === 0 || el.offsetWidth === 0) {
-                        return false;
-                    }
-
-                    // Check for common text content
-                    const textContent = el.textContent.toLowerCase();
-                    const consentTexts = [
-                        'we use cookies', 'we use cookies and similar technologies', 'this website uses cookies',
-                        'cookie', 'cookies', 'consent', 'gdpr', 'privacy', 'your experience',
-                        'accept', 'agree', 'allow', 'privacy policy', 'more information', 'learn more',
-                        '了解更多', 'подробнее', 'más información', 'plus d\'informations', 'weiterlesen',
-                        'maggiori informazioni', 'meer informatie', 'sapere di più', '了解更多信息', 'chiudi', 'schließen', 'close'
-                    ];
-                    for (const text of consentTexts) {
-                        if (textContent.includes(text)) {
-                        return true;
-                        }
-                    }
-
-                    // Recursively check parent nodes up to a certain level
-                    let parent = el.parentElement;
-                    let depth = 0;
-                    while (parent && depth < 3) {
-                        if (isCookieBanner(parent)) {
-                        return true;
-                        }
-                        parent = parent.parentElement;
-                        depth++;
-                    }
-
-                    return false;
-                    }
-
-                    function hideElements(elements) {
-                    for (const el of elements) {
-                        try {
-                        el.style.display = 'none';
-                        el.style.visibility = 'hidden';
-                        console.log('Hid cookie banner element:', el);
-                        } catch (e) {
-                        console.warn('Failed to hide element:', el, e);
-                        }
-                    }
-                    }
-
-                    function getAllElementsWithSelectors(root, selectors) {
-                    const elements = new Set();
-
-                    // For each selector, find matching elements
-                    for (const selector of selectors) {
-                        const found = root.querySelectorAll(selector);
-                        for (const el of found) {
-                        elements.add(el);
-                        }
-                    }
-
-                    // Convert the set to an array
-                    return Array.from(elements);
-                    }
-
-                    function traverseShadowDOM(root) {
-                    let elements = [];
-                    function traverse(node) {
-                        if (node.shadowRoot) {
-                        elements = elements.concat(getAllElementsWithSelectors(node.shadowRoot, selectors));
-                        traverse(node.shadowRoot);
-                        }
-                        node.childNodes.forEach(child => {
-                        if (child.nodeType === Node.ELEMENT_NODE) {
-                            traverse(child);
-                        }
-                        });
-                    }
-                    traverse(root);
-                    return elements;
-                    }
-
-                    function hideCookieBannersInRoot(root) {
-                    // Find elements matching selectors
-                    let elements = getAllElementsWithSelectors(root, selectors);
-
-                    // Include elements found in Shadow DOM
-                    elements = elements.concat(traverseShadowDOM(root));
-
-                    // Filter elements that are likely to be cookie banners
-                    elements = elements.filter(el => isCookieBanner(el));
-
-                    // Hide identified elements
-                    hideElements(elements);
-                    }
-
-                    function hideCookieBanners() {
-                    // Hide cookie banners in the main document
-                    hideCookieBannersInRoot(document);
-
-                    // Hide cookie banners in iframes (same-origin only)
-                    const iframes = document.getElementsByTagName('iframe');
-                    for (const iframe of iframes) {
-                        try {
-                        const iframeDoc = iframe.contentDocument || iframe.contentWindow.document;
-                        if (iframeDoc) {
-                            hideCookieBannersInRoot(iframeDoc);
-                        }
-                        } catch (e) {
-                        // Ignore cross-origin iframes
-                        }
-                    }
-                    }
-
-                    // Run the function after ensuring the DOM is loaded
-                    if (document.readyState === 'complete' || document.readyState === 'interactive') {
-                    setTimeout(hideCookieBanners, 1500); // Wait 1.5 seconds for dynamic content
-                    } else {
-                    document.addEventListener('DOMContentLoaded', function() {
-                        setTimeout(hideCookieBanners, 1500); // Wait 1.5 seconds after DOM content is loaded
-                    });
-                    }
-                }
-
-                hideCookieBanners();
-                })();                    
-        """)
-    except Exception as e:
-        print(f"Error hiding cookie banners: {e}")
+    await page.evaluate(HIDE_COOKIE_BANNERS_NOW_SCRIPT)
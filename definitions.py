@@ -1,8 +1,15 @@
-from pydantic import BaseModel
-from typing import List, Optional, Dict
+from dataclasses import dataclass
+from pydantic import BaseModel, ConfigDict, Field
+from typing import Annotated, Any, List, Literal, Optional, Dict, Union
 
 
-class TimingModel(BaseModel):
+class FrozenModel(BaseModel):
+    """Immutable base for the API models; unknown fields are dropped, not validated."""
+
+    model_config = ConfigDict(frozen=True, extra="ignore")
+
+
+class TimingModel(FrozenModel):
     start_time: float
     domain_lookup_start: float
     domain_lookup_end: float
@@ -14,7 +21,7 @@ class TimingModel(BaseModel):
     response_end: float
 
 
-class CookieModel(BaseModel):
+class CookieModel(FrozenModel):
     name: str
     value: str
     domain: str
@@ -25,31 +32,31 @@ class CookieModel(BaseModel):
     same_site: Optional[str]
 
 
-class NetworkDataModel(BaseModel):
+class NetworkDataModel(FrozenModel):
     url: str
     method: str
     headers: Dict[str, str]
-    cookies: List[CookieModel]
     timing: TimingModel
 
 
-class LogModel(BaseModel):
+class LogModel(FrozenModel):
     console_message: Optional[str] = None
     javascript_error: Optional[str] = None
     warning: Optional[str] = None
     error: Optional[str] = None
 
 
-class PerformanceMetricsModel(BaseModel):
+class PerformanceMetricsModel(FrozenModel):
     performance_timing: Dict[str, float]
 
 
-class DownloadedFileModel(BaseModel):
+class DownloadedFileModel(FrozenModel):
     file_name: str
-    file_content: str
+    file_url: str
+    file_content: Optional[str] = None
 
 
-class RedirectModel(BaseModel):
+class RedirectModel(FrozenModel):
     step: int
     from_url: str
     to_url: str
@@ -58,40 +65,154 @@ class RedirectModel(BaseModel):
     server: Optional[Dict[str, str]] = None
 
 
-class ResponseModel(BaseModel):
+class ResponseModel(FrozenModel):
     network: str
     page_title: str
     meta_description: str
     network_data: List[NetworkDataModel]
+    network_data_truncated: bool = False
     logs: List[LogModel]
     cookies: List[CookieModel]
     resource_type: str
     performance_metrics: PerformanceMetricsModel
-    screenshot: str
-    thumbnail: str
+    screenshot_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    video_url: Optional[str] = None
+    screenshot: Optional[str] = None
+    thumbnail: Optional[str] = None
+    video: Optional[str] = None
     downloaded_files: List[DownloadedFileModel]
     redirects: List[RedirectModel]
 
 
-class ScreenshotResponse(BaseModel):
+class ScreenshotResponse(FrozenModel):
     # Base64-encoded screenshot
     urL: str
-    screenshot: str
-    thumbnail: str
+    screenshot_url: str
+    thumbnail_url: str
+    screenshot: Optional[str] = None
+    thumbnail: Optional[str] = None
 
 
-class MinimizeHTMLResponse(BaseModel):
+class MinimizeHTMLResponse(FrozenModel):
     minified_html: str  # Minified HTML content
 
 
-class ExtractTextResponse(BaseModel):
+class ExtractTextResponse(FrozenModel):
     text: str  # Extracted plain text from HTML content
 
 
-class ReaderResponse(BaseModel):
+class ReaderResponse(FrozenModel):
     title: str
     content: str
 
 
-class MarkdownResponse(BaseModel):
+class MarkdownResponse(FrozenModel):
     markdown: str
+
+
+class CacheEvictResponse(FrozenModel):
+    tag: str
+    evicted: int
+
+
+# Load states a page navigation can wait for, from quickest to slowest. networkidle
+# waits for 500ms without requests, which long polling or analytics can hold off.
+WAIT_UNTIL = Literal["domcontentloaded", "load", "networkidle"]
+
+
+class BatchItem(FrozenModel):
+    """Base for /batch items; misspelled parameters are rejected rather than ignored."""
+
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
+
+class BrowseBatchItem(BatchItem):
+    # Same parameters and defaults as GET /browse; max_body_bytes defaults to MAX_BODY_BYTES
+    endpoint: Literal["browse"]
+    url: str
+    method: str = "GET"
+    post_data: Optional[str] = None
+    browser_name: str = "chromium"
+    cookiebanner: bool = False
+    scroll: bool = False
+    record_video: bool = False
+    embed: bool = False
+    image_format: Optional[Literal["webp", "jpeg"]] = None
+    capture_bodies: bool = False
+    max_body_bytes: Optional[int] = Field(None, gt=0)
+    screenshot: bool = True
+    downloads: bool = True
+    embed_downloads: bool = False
+    block_resources: str = ""
+    wait_until: WAIT_UNTIL = "load"
+
+
+class ScreenshotBatchItem(BatchItem):
+    # Same parameters and defaults as GET /screenshot, JSON output only
+    endpoint: Literal["screenshot"]
+    url: str
+    full_page: bool = False
+    live: bool = False
+    thumbnail_size: int = Field(450, gt=0)
+    quality: int = Field(85, gt=0, le=100)
+    embed: bool = False
+    image_format: Optional[Literal["webp", "jpeg"]] = None
+    block_resources: str = "image,font,media"
+    wait_until: WAIT_UNTIL = "load"
+
+
+class BatchRequest(FrozenModel):
+    requests: List[
+        Annotated[
+            Union[BrowseBatchItem, ScreenshotBatchItem],
+            Field(discriminator="endpoint"),
+        ]
+    ]
+
+
+class BatchResult(FrozenModel):
+    status_code: int
+    body: Any  # The endpoint's JSON response, or {"detail": ...} on errors
+
+
+class BatchResponse(FrozenModel):
+    results: List[BatchResult]
+
+
+@dataclass(slots=True)
+class RequestEvent:
+    """A request observed during a /browse session. Serialized directly by orjson."""
+
+    uuid: str
+    url: str
+    method: str
+    headers: Dict[str, str]
+    resource_type: str
+    redirected_from: Optional[str]
+    redirected_to: Optional[str]
+    timing: Dict[str, Any]
+    sizes: Dict[str, Any]
+    request_time: str
+    network: str = "request"
+
+
+@dataclass(slots=True)
+class ResponseEvent:
+    """A response observed during a /browse session. Serialized directly by orjson."""
+
+    uuid: Optional[str]
+    url: str
+    status: int
+    response_size: int
+    security: Any
+    server: Any
+    resource_type: str
+    redirected_to: Optional[str]
+    redirected_from: Optional[str]
+    timing: Dict[str, Any]
+    request_headers: Dict[str, str]
+    response_headers: Dict[str, str]
+    response_body: Optional[str]
+    response_time: str
+    network: str = "response"
@@ -0,0 +1,7 @@
+import os
+import tempfile
+
+# app and utils create their cache, asset and download directories in the working
+# directory when imported, so keep them out of the checkout.
+os.chdir(tempfile.mkdtemp(prefix="scraproxy-tests-"))
+os.environ["API_KEY"] = "none"
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from app import CompressionMiddleware, merge_vary_headers
+
+
+async def body_app(scope, receive, send):
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"vary", b"Accept, Accept-Encoding"),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": b"[" + b"1," * 2000 + b"1]"})
+
+
+def get(app, accept_encoding):
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(b"accept-encoding", accept_encoding.encode())],
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    return messages[0]["headers"]
+
+
+def test_merge_vary_headers():
+    headers = merge_vary_headers(
+        [
+            (b"content-type", b"text/plain"),
+            (b"vary", b"Accept, Accept-Encoding"),
+            (b"Vary", b"accept-encoding"),
+        ]
+    )
+    assert headers == [
+        (b"content-type", b"text/plain"),
+        (b"vary", b"Accept, Accept-Encoding"),
+    ]
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, encoding", [("br", b"br"), ("gzip", b"gzip")]
+)
+def test_compressed_responses_send_a_single_vary(accept_encoding, encoding):
+    headers = get(CompressionMiddleware(body_app), accept_encoding)
+
+    assert (b"content-encoding", encoding) in headers
+    assert [value for name, value in headers if name.lower() == b"vary"] == [
+        b"Accept, Accept-Encoding"
+    ]
@@ -0,0 +1,26 @@
+import pytest
+
+from config import _ttl_from_env
+
+
+def test_ttl_from_env_uses_default_when_unset(monkeypatch):
+    monkeypatch.delenv("TEST_TTL", raising=False)
+    assert _ttl_from_env("TEST_TTL", 30) == 30
+    assert _ttl_from_env("TEST_TTL", None) is None
+
+
+@pytest.mark.parametrize("value", ["none", "None", "NONE"])
+def test_ttl_from_env_none_disables_expiry(monkeypatch, value):
+    monkeypatch.setenv("TEST_TTL", value)
+    assert _ttl_from_env("TEST_TTL", 30) is None
+
+
+def test_ttl_from_env_parses_seconds(monkeypatch):
+    monkeypatch.setenv("TEST_TTL", "600")
+    assert _ttl_from_env("TEST_TTL", 30) == 600
+
+
+def test_ttl_from_env_rejects_garbage(monkeypatch):
+    monkeypatch.setenv("TEST_TTL", "ten minutes")
+    with pytest.raises(ValueError):
+        _ttl_from_env("TEST_TTL", 30)
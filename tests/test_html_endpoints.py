@@ -0,0 +1,148 @@
+import asyncio
+import gzip
+import time
+import uuid
+from urllib.parse import urlencode
+
+import orjson
+import pytest
+
+import app as app_module
+from app import _extract_text, _read, app
+
+
+async def post_form(path, fields, accept_encoding):
+    """Sends one POST straight to the ASGI app and returns (headers, body)."""
+    body = urlencode(fields).encode()
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "server": ("testserver", 80),
+        "client": ("testclient", 50000),
+        "headers": [
+            (b"host", b"testserver"),
+            (b"content-type", b"application/x-www-form-urlencoded"),
+            (b"content-length", str(len(body)).encode()),
+            (b"accept-encoding", accept_encoding.encode()),
+        ],
+    }
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    done = asyncio.Event()
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    headers = {}
+    chunks = []
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            headers.update((k.decode(), v.decode()) for k, v in message["headers"])
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                done.set()
+
+    await app(scope, receive, send)
+    return headers, b"".join(chunks)
+
+
+def decode(headers, body):
+    if "content-length" in headers:
+        assert int(headers["content-length"]) == len(body)
+    if headers.get("content-encoding") == "gzip":
+        body = gzip.decompress(body)
+    else:
+        assert "content-encoding" not in headers
+    return orjson.loads(body)
+
+
+@pytest.mark.parametrize("path", ["/minimize", "/extract_text", "/reader", "/markdown"])
+def test_coalesced_requests_get_their_own_response(path):
+    # Large enough to be compressed, and unique so both requests miss the cache
+    paragraph = f"<p>{uuid.uuid4().hex} some readable sentence text.</p>\n"
+    html = f"<html><body><h1>Title</h1>{paragraph * 200}</body></html>"
+
+    async def run():
+        return await asyncio.gather(
+            post_form(path, {"html": html}, "gzip"),
+            post_form(path, {"html": html}, "identity"),
+        )
+
+    (gzip_headers, gzip_body), (plain_headers, plain_body) = asyncio.run(run())
+
+    assert gzip_headers.get("content-encoding") == "gzip"
+    assert "content-encoding" not in plain_headers
+    assert decode(gzip_headers, gzip_body) == decode(plain_headers, plain_body)
+
+
+@pytest.mark.parametrize(
+    "html, expected",
+    [
+        ("", ""),
+        ("plain text", "plain text"),
+        (
+            "<html><head><title>Shop</title><style>.x{color:red}</style>"
+            '<script type="application/ld+json">{"@type":"Product"}</script></head>'
+            "<body> <p>Buy   now</p> <!-- note --> <template>hidden</template>"
+            "<script>window.dataLayer=[];gtag('js')</script>"
+            "<noscript>Enable JS</noscript></body></html>",
+            # What BeautifulSoup's get_text(separator=" ", strip=True) returned
+            "Shop Buy   now Enable JS",
+        ),
+        ("<ul><li>one</li>\n  <li> two </li></ul>", "one two"),
+    ],
+)
+def test_extract_text(html, expected):
+    assert _extract_text(html) == expected
+
+
+@pytest.mark.parametrize(
+    "html",
+    [
+        # Long enough for trafilatura
+        "<html><head><title>Post</title></head><body><nav>menu</nav><article>"
+        "<h1>Heading</h1><p>" + "A long paragraph of readable text. " * 30 + "</p>"
+        "</article></body></html>",
+        # Left to the readability fallback
+        "<html><body></body></html>",
+    ],
+)
+def test_read_returns_html(html):
+    result = _read(html)
+    assert isinstance(result["title"], str)
+    assert "<body" in result["content"]
+
+
+def test_minimize_over_budget_is_cached_once_done(monkeypatch):
+    html = f"<p>{uuid.uuid4().hex}</p>   <p>slow</p>"
+    minify = app_module._minify
+
+    def slow_minify(html):
+        time.sleep(0.3)
+        return minify(html)
+
+    monkeypatch.setattr(app_module, "MINIFY_BUDGET_THRESHOLD", 0)
+    monkeypatch.setattr(app_module, "MINIFY_BUDGET_SECONDS", 0.05)
+    monkeypatch.setattr(app_module, "_minify", slow_minify)
+
+    async def run():
+        first = decode(*await post_form("/minimize", {"html": html}, "identity"))
+        await asyncio.gather(*app_module._minify_tasks.values())
+        second = decode(*await post_form("/minimize", {"html": html}, "identity"))
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == {"minified_html": html}
+    assert second == {"minified_html": minify(html)}
+    assert not app_module._minify_tasks
@@ -0,0 +1,88 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+import app as app_module
+from app import app
+from utils import ASSETS_DIR, DOWNLOADS_DIR
+
+
+def get(path, authorization=None):
+    """Sends one GET straight to the ASGI app and returns (status, headers, body)."""
+    headers = [(b"host", b"testserver")]
+    if authorization:
+        headers.append((b"authorization", authorization.encode()))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "server": ("testserver", 80),
+        "client": ("testclient", 50000),
+        "headers": headers,
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start = messages[0]
+    body = b"".join(m.get("body", b"") for m in messages[1:])
+    return start["status"], dict(start["headers"]), body
+
+
+def store(directory, data, extension):
+    os.makedirs(directory, exist_ok=True)
+    filename = f"{hashlib.sha256(data).hexdigest()}.{extension}"
+    with open(os.path.join(directory, filename), "wb") as f:
+        f.write(data)
+    return filename
+
+
+def test_assets_are_served():
+    filename = store(ASSETS_DIR, b"\x89PNG fake", "png")
+    status, headers, body = get(f"/assets/{filename}")
+    assert status == 200
+    assert body == b"\x89PNG fake"
+    assert headers[b"content-type"] == b"image/png"
+
+
+@pytest.mark.parametrize("filename", ["missing.png", "0" * 64 + ".png", "conftest.py"])
+def test_unknown_assets_are_not_found(filename):
+    assert get(f"/assets/{filename}")[0] == 404
+
+
+def test_assets_require_the_api_key_when_set(monkeypatch):
+    filename = store(ASSETS_DIR, b"\x89PNG fake", "png")
+    monkeypatch.setattr(app_module, "API_KEY", "secret")
+    assert get(f"/assets/{filename}")[0] == 401
+    assert get(f"/assets/{filename}", "Bearer wrong")[0] == 403
+    assert get(f"/assets/{filename}", "Bearer secret")[0] == 200
+
+
+def test_downloads_are_served_as_attachments():
+    filename = store(DOWNLOADS_DIR, b"<script>alert(1)</script>", "html")
+    status, headers, body = get(f"/downloads/{filename}")
+    assert status == 200
+    assert body == b"<script>alert(1)</script>"
+    assert headers[b"content-type"] == b"application/octet-stream"
+    assert headers[b"content-disposition"].startswith(b"attachment")
+    assert headers[b"x-content-type-options"] == b"nosniff"
+
+
+def test_downloads_require_the_api_key_when_set(monkeypatch):
+    filename = store(DOWNLOADS_DIR, b"data", "bin")
+    monkeypatch.setattr(app_module, "API_KEY", "secret")
+    assert get(f"/downloads/{filename}")[0] == 401
+    assert get(f"/downloads/{filename}", "Bearer secret")[0] == 200
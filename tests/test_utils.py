@@ -0,0 +1,176 @@
+import asyncio
+import hashlib
+import os
+import time
+
+import pytest
+import pyvips
+
+from utils import (
+    WEBP_MAX_DIMENSION,
+    _encode_image,
+    generate_params_key,
+    negotiate_image_format,
+    parse_resource_types,
+    prune_assets,
+    singleflight,
+    store_asset_file,
+)
+
+
+@pytest.mark.parametrize(
+    "accept, expected",
+    [
+        (None, "webp"),
+        ("", "webp"),
+        ("text/html,application/xhtml+xml", "webp"),
+        ("image/avif,image/webp,*/*", "webp"),
+        ("image/*", "webp"),
+        ("image/png,image/jpeg", "jpeg"),
+        ("IMAGE/JPEG", "jpeg"),
+    ],
+)
+def test_negotiate_image_format(accept, expected):
+    assert negotiate_image_format(accept) == expected
+
+
+def test_generate_params_key_ignores_argument_order():
+    assert generate_params_key(url="a", full_page=True) == generate_params_key(
+        full_page=True, url="a"
+    )
+
+
+def test_generate_params_key_distinguishes_values():
+    keys = {
+        generate_params_key(url="a", quality=85),
+        generate_params_key(url="a", quality=90),
+        generate_params_key(url="a", quality="85"),
+        # Separators inside values cannot shift into another parameter
+        generate_params_key(url="a:b", image_format=""),
+        generate_params_key(url="a", image_format=":b"),
+    }
+    assert len(keys) == 5
+    assert all(len(key) == 32 for key in keys)
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (None, frozenset()),
+        ("", frozenset()),
+        ("image", {"image"}),
+        (" image, font ,,media ", {"image", "font", "media"}),
+    ],
+)
+def test_parse_resource_types(value, expected):
+    assert parse_resource_types(value) == expected
+
+
+def write_file(path, content=b"content"):
+    with open(path, "wb") as f:
+        f.write(content)
+    return path
+
+
+def test_store_asset_file_names_by_hash_and_moves(tmp_path):
+    source = write_file(tmp_path / "download.tmp", b"payload")
+    target = tmp_path / "store"
+    target.mkdir()
+
+    name = store_asset_file(str(source), "pdf", directory=str(target))
+
+    assert name == f"{hashlib.sha256(b'payload').hexdigest()}.pdf"
+    assert (target / name).read_bytes() == b"payload"
+    assert not source.exists()
+
+
+def test_store_asset_file_deduplicates(tmp_path):
+    target = tmp_path / "store"
+    target.mkdir()
+    first = store_asset_file(
+        str(write_file(tmp_path / "a", b"same")), "", directory=str(target)
+    )
+    second_source = write_file(tmp_path / "b", b"same")
+    second = store_asset_file(str(second_source), "", directory=str(target))
+
+    assert first == second == hashlib.sha256(b"same").hexdigest()
+    assert os.listdir(target) == [first]
+    assert not second_source.exists()
+
+
+def test_prune_assets_removes_only_expired_files(tmp_path):
+    old = write_file(tmp_path / "old")
+    os.utime(old, (time.time() - 120, time.time() - 120))
+    new = write_file(tmp_path / "new")
+
+    assert prune_assets(str(tmp_path), 60) == 1
+    assert not old.exists()
+    assert new.exists()
+
+
+def test_storing_again_keeps_an_asset_from_being_pruned(tmp_path):
+    target = tmp_path / "store"
+    target.mkdir()
+    name = store_asset_file(str(write_file(tmp_path / "a")), "", directory=str(target))
+    os.utime(target / name, (time.time() - 120, time.time() - 120))
+
+    store_asset_file(str(write_file(tmp_path / "b")), "", directory=str(target))
+
+    assert prune_assets(str(target), 60) == 0
+    assert (target / name).exists()
+
+
+def test_singleflight_runs_concurrent_work_once():
+    calls = 0
+
+    async def work():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"value": calls}
+
+    async def run():
+        return await asyncio.gather(*(singleflight("key", work) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert calls == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_singleflight_shares_exceptions_and_releases_the_key():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    async def succeed():
+        return "ok"
+
+    async def run():
+        results = await asyncio.gather(
+            singleflight("failing", fail),
+            singleflight("failing", fail),
+            return_exceptions=True,
+        )
+        return results, await singleflight("failing", succeed)
+
+    results, retried = asyncio.run(run())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert retried == "ok"
+
+
+@pytest.mark.parametrize("size", [(1280, 20000), (20000, 800)])
+def test_encode_image_scales_oversized_webp_down(size):
+    width, height = size
+    image = pyvips.Image.black(width, height, bands=3)
+
+    encoded = pyvips.Image.new_from_buffer(_encode_image(image, "webp", 85), "")
+
+    assert max(encoded.width, encoded.height) == WEBP_MAX_DIMENSION
+    # The aspect ratio is kept
+    assert encoded.width / encoded.height == pytest.approx(width / height, rel=0.01)
+
+
+def test_encode_image_keeps_oversized_jpeg():
+    image = pyvips.Image.black(1280, 20000, bands=3)
+    encoded = pyvips.Image.new_from_buffer(_encode_image(image, "jpeg", 85), "")
+    assert (encoded.width, encoded.height) == (1280, 20000)
@@ -1,10 +1,21 @@
-from PIL import Image
+import aiofiles
+import pybase64
+import pyvips
 import hashlib
-import io
+import xxhash
+import orjson
+import shutil
 import os
 from dotenv import load_dotenv
+from starlette.concurrency import run_in_threadpool
 import asyncio
 import time
+import uuid
+
+# Screenshots, thumbnails and videos are written here and served under /assets.
+ASSETS_DIR = os.path.join(os.getcwd(), "storage")
+# Files downloaded during /browse sessions are written here and served under /downloads.
+DOWNLOADS_DIR = os.path.join(os.getcwd(), "downloads")
 
 
 def load_env_file(env_file=".env"):
@@ -25,37 +36,276 @@ def load_env_file(env_file=".env"):
         return False
 
 
-def optimize_image(image, width=None, height=None, quality=85):
+# File extension used for each supported output image format.
+IMAGE_EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+
+
+def negotiate_image_format(accept_header):
     """
-    Resizes and optimizes an image using Pillow.
-    - If width and height are None, the image is optimized in its original size.
-    - Otherwise, the image is resized to the given width and height.
+    Picks the output image format from an Accept header.
+    WebP is used unless the client lists image types without WebP (or image/*),
+    in which case it gets JPEG.
     """
-    if width and height:
-        image = image.resize((width, height), Image.Resampling.LANCZOS)
+    accept = (accept_header or "").lower()
+    if "image/" in accept and "image/webp" not in accept and "image/*" not in accept:
+        return "jpeg"
+    return "webp"
+
+
+# libwebp cannot encode images with a side of 16384 px or more.
+WEBP_MAX_DIMENSION = 16383
 
-    # Convert the image to JPEG and optimize it
-    buffer = io.BytesIO()
-    image.save(buffer, format="JPEG", quality=quality, optimize=True)
-    return buffer.getvalue()
 
+def _encode_image(image, image_format, quality):
+    if image_format == "webp":
+        longest = max(image.width, image.height)
+        if longest > WEBP_MAX_DIMENSION:
+            # Full-page captures of long pages; scale down rather than fail
+            image = image.resize(WEBP_MAX_DIMENSION / longest)
+        return image.write_to_buffer(".webp", Q=quality)
+    if image.hasalpha():
+        image = image.flatten(background=255)
+    return image.write_to_buffer(
+        ".jpg", Q=quality, optimize_coding=True, interlace=True, strip=True
+    )
 
-def create_thumbnail(image, max_size):
+
+def create_thumbnail(buffer, max_size, quality=85, image_format="webp"):
     """
-    Creates a thumbnail using Pillow's thumbnail method, maintaining aspect ratio.
+    Creates a thumbnail from an encoded image using libvips, maintaining aspect ratio.
     The image will fit within a (max_size x max_size) box while keeping proportions.
+    libvips shrinks JPEGs while decoding, so large screenshots are never fully loaded.
+    `buffer` may also be an already decoded pyvips image.
+    """
+    if isinstance(buffer, pyvips.Image):
+        image = buffer.thumbnail_image(max_size, height=max_size)
+    else:
+        image = pyvips.Image.thumbnail_buffer(buffer, max_size, height=max_size)
+    return _encode_image(image, image_format, quality)
+
+
+def _decode_image(buffer):
+    # Decoded into memory so several encodes can read the pixels at once.
+    return pyvips.Image.new_from_buffer(buffer, "").copy_memory()
+
+
+async def capture_screenshot(
+    page, full_page=False, quality=85, thumbnail_size=450, image_format="webp"
+):
+    """
+    Takes a screenshot of the page and returns the encoded image and its thumbnail.
+    Pass `thumbnail_size=None` to skip the thumbnail (returned as None).
+
+    JPEG screenshots are encoded by the browser and returned as-is; they are only
+    decoded (at reduced scale) to build the thumbnail. WebP needs a lossless PNG
+    capture that is re-encoded. PNG has no shrink-on-load, so it is decoded once
+    and the pixels are shared by the full image and the thumbnail.
+
+    The encodes run in worker threads, concurrently, since libvips releases the GIL
+    and they would otherwise block the event loop.
+    """
+    if image_format == "jpeg":
+        screenshot = await page.screenshot(
+            full_page=full_page, type="jpeg", quality=quality
+        )
+    else:
+        screenshot = await page.screenshot(full_page=full_page)
+        screenshot = await run_in_threadpool(_decode_image, screenshot)
+
+    async def encode_full():
+        if image_format == "jpeg":
+            return screenshot
+        return await run_in_threadpool(_encode_image, screenshot, image_format, quality)
+
+    async def encode_thumbnail():
+        if not thumbnail_size:
+            return None
+        return await run_in_threadpool(
+            create_thumbnail,
+            screenshot,
+            max_size=thumbnail_size,
+            image_format=image_format,
+        )
+
+    full_image, thumbnail = await asyncio.gather(encode_full(), encode_thumbnail())
+    return full_image, thumbnail
+
+
+def _write_asset(filename, write, directory=ASSETS_DIR):
+    path = os.path.join(directory, filename)
+    try:
+        # Already stored: refresh its age so prune_assets keeps it while it is referenced.
+        os.utime(path)
+    except FileNotFoundError:
+        # Write to a temporary name first so readers never see a partial file.
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    return filename
+
+
+def prune_assets(directory, max_age):
+    """
+    Deletes files in `directory` that were not stored (or stored again) within the last
+    `max_age` seconds. Assets are only referenced by cached results, so once every cache
+    entry that could point at one has expired, it is no longer needed.
+
+    Returns:
+        int: The number of files deleted.
+    """
+    cutoff = time.time() - max_age
+    removed = 0
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                # Removed concurrently, e.g. by another worker's sweep
+                pass
+    return removed
+
+
+def store_asset(data, extension):
+    """
+    Stores binary content in the assets directory, named by its SHA-256 hash.
+
+    Args:
+        data (bytes): The content to store.
+        extension (str): The file extension to use, without the leading dot.
+
+    Returns:
+        str: The file name of the stored asset.
+    """
+
+    def write(tmp_path):
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+
+    return _write_asset(f"{hashlib.sha256(data).hexdigest()}.{extension}", write)
+
+
+def store_asset_file(path, extension, directory=ASSETS_DIR, chunk_size=1024 * 1024):
+    """
+    Moves an existing file into `directory` (the assets directory by default), named by
+    its SHA-256 hash. The file is hashed in chunks so it is never fully loaded into memory.
+
+    Returns:
+        str: The file name of the stored asset.
     """
-    img_copy = image.copy()
-    img_copy.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            sha256.update(chunk)
+
+    filename = sha256.hexdigest()
+    if extension:
+        filename = f"{filename}.{extension}"
+    # shutil.move, since the source may be on another filesystem (e.g. a temp dir)
+    filename = _write_asset(
+        filename, lambda tmp_path: shutil.move(path, tmp_path), directory
+    )
+    if os.path.exists(path):
+        # The same content was already stored.
+        os.remove(path)
+    return filename
 
-    # Convert the thumbnail to JPEG and optimize it
-    buffer = io.BytesIO()
-    img_copy.save(buffer, format="JPEG", quality=85, optimize=True)
-    return buffer.getvalue()
+
+async def b64encode_file(path, chunk_size=768 * 1024):
+    """
+    Base64-encodes a file without blocking the event loop or loading it all at once.
+    `chunk_size` must be a multiple of 3 so the encoded chunks concatenate cleanly.
+
+    Returns:
+        str: The base64-encoded file content.
+    """
+    encoded = bytearray()
+    async with aiofiles.open(path, "rb") as f:
+        while chunk := await f.read(chunk_size):
+            encoded += pybase64.b64encode(chunk)
+    return encoded.decode("ascii")
+
+
+_inflight = {}
+
+
+async def singleflight(key, work):
+    """
+    Coalesces concurrent identical work. The first caller for `key` runs `work()`;
+    callers arriving while it is in flight await the same result (or exception)
+    instead of repeating the work.
+
+    The result is shared by reference, so `work` should return plain data rather than
+    a Response; responses are mutated while they are sent (e.g. by compression).
+
+    Args:
+        key (str): Identifies the work, typically the cache key.
+        work: A zero-argument callable returning an awaitable.
+    """
+    future = _inflight.get(key)
+    if future is not None:
+        return await asyncio.shield(future)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    try:
+        result = await work()
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except BaseException as e:
+        future.set_exception(e)
+        # Mark the exception as retrieved in case no other caller was waiting.
+        future.exception()
+        raise
+    else:
+        future.set_result(result)
+        return result
+    finally:
+        del _inflight[key]
 
 
 def generate_cache_key(data):
-    return hashlib.md5(data.encode("utf-8")).hexdigest()
+    # Keys are not security sensitive, and whole HTML bodies get hashed here, so use
+    # the much faster XXH3. The 128-bit digest keeps keys at 32 hex characters.
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return xxhash.xxh3_128_hexdigest(data)
+
+
+def generate_params_key(**params):
+    """
+    Cache key for a set of request parameters. They are serialized with orjson and
+    sorted keys, so neither argument order nor separators in the values can collide.
+    """
+    return generate_cache_key(orjson.dumps(params, option=orjson.OPT_SORT_KEYS))
+
+
+def parse_resource_types(value):
+    """
+    Parses a comma-separated list of Playwright resource types, e.g. "image,font,media".
+    """
+    if not value:
+        return frozenset()
+    return frozenset(part.strip() for part in value.split(",") if part.strip())
+
+
+async def block_resource_types(context, resource_types):
+    """
+    Aborts every request in `context` whose resource type is in `resource_types`.
+    Does nothing, and installs no route, if `resource_types` is empty.
+    """
+    if not resource_types:
+        return
+
+    async def handle_route(route):
+        if route.request.resource_type in resource_types:
+            await route.abort()
+        else:
+            await route.continue_()
+
+    await context.route("**/*", handle_route)
 
 
 async def smooth_scroll(page, max_duration=30, scroll_pause=0.5, scroll_amount=100):